@@ -0,0 +1,280 @@
+"""
+Benchmarks of the FairNet pipeline on synthetic graphs.
+
+For every generator and size, it times FairNet.fit, get_plausible_edges, get_removable_edges, the evaluation of
+single individuals and of whole populations, and the GA runs (FairNet.run and replace_missing_values) per
+generation, together with the peak memory they allocate, traced by tracemalloc. Results are written to a JSON
+file, so that runs can be compared with --compare.
+
+Generators:
+    sbm       stochastic block model with controlled homophily (fraction of intra-block edges)
+    powerlaw  Barabasi-Albert graph with skewed random labels
+
+Usage:
+    python benchmarks/bench_fairnet.py --sizes 1000 10000 --output bench.json
+    python benchmarks/bench_fairnet.py --sizes 1000000 --skip-ga --output large.json
+    python benchmarks/bench_fairnet.py --sizes 1000 --compare bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import networkx as nx
+import numpy as np
+import scipy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fairnet import FairNet  # noqa: E402
+from fairnet.edges import get_plausible_edges, get_removable_edges  # noqa: E402
+from fairnet.genetic import MarginalizationEvaluator  # noqa: E402
+from fairnet.genome import PackedGenome  # noqa: E402
+
+
+def sbm_graph(n: int, avg_degree: float, homophily: float, seed: int) -> tuple:
+    """
+    Generates a stochastic block model with 3 unbalanced blocks (50%, 30%, 20%); a fraction 'homophily' of the
+    expected edges falls within blocks. Labels are the blocks.
+    :return: a tuple (graph, attrs)
+    """
+    sizes = [n // 2, (3 * n) // 10]
+    sizes.append(n - sum(sizes))
+    k = len(sizes)
+    p_in = homophily * avg_degree * n / sum(s * s for s in sizes)
+    p_out = (1 - homophily) * avg_degree * n / (n * n - sum(s * s for s in sizes))
+    probs = [[p_in if i == j else p_out for j in range(k)] for i in range(k)]
+    g = nx.stochastic_block_model(sizes, probs, seed=seed, sparse=True)
+    attrs = {node: g.nodes[node]["block"] for node in g.nodes()}
+    return g, attrs
+
+
+def powerlaw_graph(n: int, avg_degree: float, seed: int) -> tuple:
+    """
+    Generates a Barabasi-Albert graph, with labels drawn with probabilities (60%, 30%, 10%).
+    :return: a tuple (graph, attrs)
+    """
+    g = nx.barabasi_albert_graph(n, max(1, int(avg_degree // 2)), seed=seed)
+    rng = np.random.RandomState(seed)
+    labels = rng.choice(3, size=n, p=[0.6, 0.3, 0.1])
+    return g, dict(zip(g.nodes(), labels.tolist()))
+
+
+GENERATORS = {
+    "sbm": lambda n, args: sbm_graph(n, args.avg_degree, args.homophily, args.seed),
+    "powerlaw": lambda n, args: powerlaw_graph(n, args.avg_degree, args.seed),
+}
+
+
+def reset_peak() -> int:
+    """
+    Resets the peak of the traced memory; before Python 3.9, by clearing the traces.
+    :return: the traced memory after the reset
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.clear_traces()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def measure(func, *args, **kwargs) -> tuple:
+    """
+    Runs the function, with its output silenced.
+    :return: a tuple (result, seconds, peak traced memory in bytes above the memory traced at the start)
+    """
+    base = reset_peak()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    return result, seconds, peak - base
+
+
+def record(results: dict, name: str, seconds: float, peak: int, **extra) -> None:
+    results[name] = {"seconds": seconds, "peak_mb": peak / 2**20, **extra}
+
+
+def bench_graph(g: nx.Graph, attrs: dict, args) -> dict:
+    results = {"nodes": g.number_of_nodes(), "edges": g.number_of_edges()}
+
+    fn, seconds, peak = measure(lambda: FairNet(g, attrs).fit(args.thresh))
+    record(results, "fit", seconds, peak, marginalized=len(fn.disc_nodes))
+
+    fn.strategy, fn.to_add, fn.to_remove = args.strategy, args.fraction, args.fraction
+    plausible, seconds, peak = measure(get_plausible_edges, fn)
+    record(results, "plausible_edges", seconds, peak, candidates=len(plausible))
+    removable, seconds, peak = measure(get_removable_edges, fn)
+    record(results, "removable_edges", seconds, peak, candidates=len(removable))
+
+    fn.fitness = "nodes"
+    fn.candidates = plausible + removable
+    evaluator, seconds, peak = measure(MarginalizationEvaluator, fn)
+    record(results, "evaluator", seconds, peak)
+
+    genomes = [PackedGenome.random(len(fn.candidates)) for _ in range(args.evals)]
+    _, seconds, peak = measure(lambda: [evaluator((genome,)) for genome in genomes])
+    record(
+        results, "single_eval", seconds, peak, evals_per_second=len(genomes) / seconds
+    )
+    _, seconds, peak = measure(evaluator.evaluate_batch, genomes)
+    record(
+        results, "batch_eval", seconds, peak, evals_per_second=len(genomes) / seconds
+    )
+
+    if args.skip_ga:
+        return results
+
+    GA_params = {
+        "NUM_GENERATIONS": args.generations,
+        "POPULATION_SIZE": args.population,
+        "N_JOBS": args.jobs,
+    }
+    fn = FairNet(g, attrs).fit(args.thresh)
+    _, seconds, peak = measure(
+        fn.run,
+        fitness="nodes",
+        strategy=args.strategy,
+        to_add=args.fraction,
+        to_remove=args.fraction,
+        GA_params=GA_params,
+        display=False,
+    )
+    evals = sum(r.get("misses", args.population) for r in fn.logbook)
+    record(
+        results,
+        "run",
+        seconds,
+        peak,
+        seconds_per_generation=seconds / len(fn.logbook),
+        evals_per_second=evals / seconds,
+    )
+
+    partial = dict(attrs)
+    rng = random.Random(args.seed)
+    for node in rng.sample(list(partial), int(len(partial) * args.missing)):
+        del partial[node]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # the missing values are expected
+        fn = FairNet(g, partial)
+    _, seconds, peak = measure(
+        fn.replace_missing_values,
+        thresh=args.thresh,
+        fitness="nodes",
+        GA_params=GA_params,
+        display=False,
+    )
+    evals = sum(r.get("misses", args.population) for r in fn.logbook)
+    record(
+        results,
+        "replace_missing_values",
+        seconds,
+        peak,
+        seconds_per_generation=seconds / len(fn.logbook),
+        evals_per_second=evals / seconds,
+    )
+    return results
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "networkx": nx.__version__,
+    }
+
+
+def compare(current: list, baseline_path: str) -> None:
+    """
+    Prints the ratio current/baseline of the times of the benchmarks found in both runs.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["generator"], r["size"]): r for r in json.load(f)["results"]}
+    for result in current:
+        base = baseline.get((result["generator"], result["size"]))
+        if base is None:
+            continue
+        for name, values in result.items():
+            if isinstance(values, dict) and name in base:
+                ratio = values["seconds"] / max(base[name]["seconds"], 1e-12)
+                print(
+                    f"{result['generator']:>9} {result['size']:>8} {name:>24}: "
+                    f"{values['seconds']:.4f}s ({ratio:.2f}x baseline)"
+                )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument(
+        "--generators", nargs="+", default=list(GENERATORS), choices=list(GENERATORS)
+    )
+    parser.add_argument("--avg-degree", type=float, default=10.0)
+    parser.add_argument("--homophily", type=float, default=0.8)
+    parser.add_argument("--thresh", type=float, default=0.3)
+    parser.add_argument("--strategy", default="bl")
+    parser.add_argument("--fraction", type=float, default=0.1)
+    parser.add_argument("--missing", type=float, default=0.05)
+    parser.add_argument("--evals", type=int, default=100)
+    parser.add_argument("--generations", type=int, default=3)
+    parser.add_argument("--population", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--skip-ga", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_fairnet.json")
+    parser.add_argument("--compare", default=None)
+    args = parser.parse_args(argv)
+
+    np.random.seed(args.seed)
+    random.seed(args.seed)
+    tracemalloc.start()
+
+    results = []
+    for name in args.generators:
+        for size in args.sizes:
+            g, attrs = GENERATORS[name](size, args)
+            result = {"generator": name, "size": size, **bench_graph(g, attrs, args)}
+            results.append(result)
+            print(
+                f"{name:>9} {size:>8}: "
+                + ", ".join(
+                    f"{k} {v['seconds']:.3f}s"
+                    for k, v in result.items()
+                    if isinstance(v, dict)
+                )
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {"meta": metadata(), "params": vars(args), "results": results}, f, indent=2
+        )
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
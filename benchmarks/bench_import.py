@@ -0,0 +1,110 @@
+"""
+Start-up benchmark: the wall time of 'import fairnet' in fresh interpreters, and the heaviest modules it loads
+(from python -X importtime). Exits with status 1 if the median exceeds --max-seconds, or if one of the
+--forbidden modules (the plotting stack, by default) gets imported, so that it can guard against regressions.
+
+Usage:
+    python benchmarks/bench_import.py --repeat 10 --output import.json
+    python benchmarks/bench_import.py --max-seconds 1.5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+TIMED = (
+    "import sys, time; start = time.perf_counter(); import fairnet; "
+    "print(time.perf_counter() - start); print(','.join(sorted(sys.modules)))"
+)
+
+
+def time_import() -> tuple:
+    """
+    Imports fairnet in a fresh interpreter.
+    :return: a tuple (seconds, set of loaded modules)
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", TIMED],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=True,
+    ).stdout.splitlines()
+    return float(out[0]), set(out[1].split(","))
+
+
+def heaviest_modules(n: int) -> list:
+    """
+    Returns the n modules with the largest cumulative import time, as (module, seconds) pairs.
+    """
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import fairnet"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        check=True,
+    ).stderr.splitlines()
+    times = []
+    for line in err:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        times.append((module.strip(), int(cumulative) / 1e6))
+    return sorted(times, key=lambda t: -t[1])[:n]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument(
+        "--forbidden", nargs="*", default=["matplotlib", "seaborn", "tqdm"]
+    )
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    time_import()  # warm the file system caches
+    seconds, modules = [], set()
+    for _ in range(args.repeat):
+        s, modules = time_import()
+        seconds.append(s)
+    forbidden = sorted(m for m in args.forbidden if m in modules)
+    result = {
+        "python": platform.python_version(),
+        "seconds": seconds,
+        "median": statistics.median(seconds),
+        "min": min(seconds),
+        "modules": len(modules),
+        "forbidden": forbidden,
+        "heaviest": heaviest_modules(args.top),
+    }
+
+    print(
+        f"import fairnet: median {result['median']:.3f}s, min {result['min']:.3f}s, "
+        f"{result['modules']} modules loaded"
+    )
+    for module, s in result["heaviest"]:
+        print(f"    {s:.3f}s  {module}")
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failed = False
+    if forbidden:
+        print(f"FAIL: {', '.join(forbidden)} imported at start-up")
+        failed = True
+    if args.max_seconds is not None and result["median"] > args.max_seconds:
+        print(f"FAIL: median above {args.max_seconds}s")
+        failed = True
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
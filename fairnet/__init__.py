@@ -1 +1,3 @@
 from .classes import FairNet
+from .index import GraphIndex
+from .batch import fit_many, fit_partition
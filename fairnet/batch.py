@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import warnings
+from collections import namedtuple
+from collections.abc import Mapping
+from functools import partial
+
+from .classes import FairNet
+from .index import GraphIndex
+from .marginalization import network_marginalization_score
+
+__all__ = ["FitResult", "fit_many", "fit_partition"]
+
+FitResult = namedtuple(
+    "FitResult", ["key", "n_nodes", "marginalized", "sms", "error"], defaults=[None]
+)
+FitResult.__doc__ = """
+Summary of the fit of one graph: its key, number of nodes, number of marginalized nodes and network
+marginalization score (SMS, the average absolute marginalization score). 'error' holds the message of the
+exception raised by the fit, if any (see the 'errors' parameter), in which case the other values are None.
+"""
+
+
+def _fit_one(item: tuple, thresh: float, errors: str) -> FitResult:
+    """
+    Fits one graph, in a worker process or in the current one.
+    :param item: a tuple (key, graph, attrs)
+    :param thresh: the marginalization threshold
+    :param errors: either 'raise' or 'return'
+    :return: the FitResult
+    """
+    key, g, attrs = item
+    attrs = {
+        n: attrs[n] for n in g if n in attrs
+    }  # the weights count the nodes of g only
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # missing values
+            fn = FairNet(GraphIndex(g, attrs)).fit(thresh)  # the graph is not copied
+        return FitResult(
+            key,
+            len(fn.index),
+            len(fn.disc_nodes),
+            float(network_marginalization_score(fn.marg_dict)),
+        )
+    except Exception as e:
+        if errors == "raise":
+            raise
+        return FitResult(
+            key, g.number_of_nodes(), None, None, f"{type(e).__name__}: {e}"
+        )
+
+
+def _run(items, n_items, thresh, n_jobs, chunksize, ordered, errors):
+    """
+    Checks the parameters, and returns the generator of the FitResult of the (key, graph, attrs) items.
+    """
+    if errors not in ("raise", "return"):
+        raise ValueError("'errors' must be either 'raise' or 'return'")
+    if n_jobs is None or n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, n_items // (4 * n_jobs)) if n_items is not None else 8
+    fit = partial(_fit_one, thresh=thresh, errors=errors)
+    return _results(fit, items, n_jobs, chunksize, ordered)
+
+
+def _results(fit, items, n_jobs: int, chunksize: int, ordered: bool):
+    """
+    Fits the items, serially or on a process pool, and yields their FitResult.
+    """
+    if n_jobs <= 1:
+        yield from map(fit, items)
+        return
+
+    with multiprocessing.Pool(n_jobs) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(fit, items, chunksize=chunksize)
+
+
+def fit_many(
+    graphs,
+    thresh: float,
+    n_jobs: int = 1,
+    chunksize: int = None,
+    ordered: bool = False,
+    errors: str = "raise",
+):
+    """
+    Fits many graphs, e.g. ego networks, and streams back the summary of each fit as soon as it is done.
+    With n_jobs > 1 (or -1, for all cores) the graphs are fitted on a process pool, which receives them in
+    chunks of 'chunksize' graphs, to amortize the inter-process communication over many small graphs.
+
+        for result in fit_many(((g, attrs) for g in ego_networks), thresh=0.3, n_jobs=-1):
+            print(result.key, result.marginalized, result.sms)
+
+    :param graphs: an iterable of (graph, attrs) pairs, keyed by their position, or a dict {key: (graph, attrs)};
+        attrs may hold the values of other nodes too, e.g. the attributes of the whole network
+    :param thresh: the marginalization threshold
+    :param n_jobs: the number of worker processes
+    :param chunksize: the number of graphs sent to a worker at once; by default, a quarter of the graphs per
+        worker if their number is known, 8 otherwise
+    :param ordered: whether to yield the results in the order of the graphs, instead of as they finish
+    :param errors: either 'raise', to propagate the exceptions of the fits, or 'return', to report them in
+        the 'error' field of the results
+    :return: a generator of FitResult
+    """
+    if isinstance(graphs, Mapping):
+        items = ((key, g, attrs) for key, (g, attrs) in graphs.items())
+    else:
+        items = ((key, g, attrs) for key, (g, attrs) in enumerate(graphs))
+    n_items = len(graphs) if hasattr(graphs, "__len__") else None
+    return _run(items, n_items, thresh, n_jobs, chunksize, ordered, errors)
+
+
+def fit_partition(
+    g,
+    attrs: dict,
+    partition,
+    thresh: float,
+    n_jobs: int = 1,
+    chunksize: int = None,
+    ordered: bool = False,
+    errors: str = "raise",
+):
+    """
+    Fits the subgraphs induced by the blocks of a partition of one graph, e.g. its communities, and streams
+    back the summary of each fit as soon as it is done (see 'fit_many'). The subgraphs are copied, so that
+    each worker receives its subgraphs only, and not the whole graph.
+    :param g: the graph
+    :param attrs: the node-to-attribute value dict of the graph
+    :param partition: a dict {node: block}, keyed by block, or an iterable of sets of nodes (e.g. the output
+        of the networkx community algorithms), keyed by position
+    :param thresh: the marginalization threshold
+    :param n_jobs: the number of worker processes
+    :param chunksize: the number of subgraphs sent to a worker at once
+    :param ordered: whether to yield the results in the order of the blocks, instead of as they finish
+    :param errors: either 'raise' or 'return', see 'fit_many'
+    :return: a generator of FitResult
+    """
+    if isinstance(partition, Mapping):
+        blocks = dict()
+        for node, block in partition.items():
+            blocks.setdefault(block, []).append(node)
+    else:
+        blocks = dict(enumerate(partition))
+
+    items = (
+        (
+            key,
+            g.subgraph(nodes).copy(),
+            {n: attrs[n] for n in nodes if n in attrs},
+        )
+        for key, nodes in blocks.items()
+    )
+    return _run(items, len(blocks), thresh, n_jobs, chunksize, ordered, errors)
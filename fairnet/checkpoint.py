@@ -0,0 +1,130 @@
+import os
+import pickle
+import random
+
+import numpy as np
+
+from .genome import PackedGenome
+
+__all__ = ["save_checkpoint", "load_checkpoint"]
+
+
+def _pack_genomes(genomes: list, prefix: str) -> dict:
+    """
+    Stacks the genomes into arrays: packed genomes as a (n x bytes) uint8 array, other genomes as a (n x genes)
+    array of their values.
+    :param genomes: the list of genomes
+    :param prefix: the prefix of the array names
+    :return: a dictionary of arrays
+    """
+    if len(genomes) > 0 and isinstance(genomes[0], PackedGenome):
+        return {
+            f"{prefix}_bits": np.stack([genome.bits for genome in genomes]),
+            f"{prefix}_size": np.array(genomes[0].size),
+        }
+    return {f"{prefix}_genes": np.array([np.asarray(genome) for genome in genomes])}
+
+
+def _unpack_genomes(data, prefix: str) -> list:
+    """
+    Inverse of '_pack_genomes'.
+    :param data: the loaded arrays
+    :param prefix: the prefix of the array names
+    :return: the list of genomes
+    """
+    if f"{prefix}_bits" in data:
+        size = int(data[f"{prefix}_size"])
+        return [PackedGenome(bits.copy(), size) for bits in data[f"{prefix}_bits"]]
+    return [genes.tolist() for genes in data[f"{prefix}_genes"]]
+
+
+def _pack_fitness(individuals: list, prefix: str) -> dict:
+    """
+    Stacks the fitness values into a float array, recording which objectives hold integers.
+    :param individuals: the list of individuals
+    :param prefix: the prefix of the array names
+    :return: a dictionary of arrays
+    """
+    values = [ind.fitness.values for ind in individuals]
+    integral = [
+        all(isinstance(fit[i], (int, np.integer)) for fit in values)
+        for i in range(len(values[0]) if values else 0)
+    ]
+    return {
+        f"{prefix}_fitness": np.array(values, dtype=float),
+        f"{prefix}_integral": np.array(integral, dtype=bool),
+    }
+
+
+def _unpack_fitness(data, prefix: str) -> list:
+    """
+    Inverse of '_pack_fitness'.
+    :param data: the loaded arrays
+    :param prefix: the prefix of the array names
+    :return: the list of fitness values
+    """
+    integral = data[f"{prefix}_integral"].tolist()
+    return [
+        tuple(int(v) if is_int else v for v, is_int in zip(fit, integral))
+        for fit in data[f"{prefix}_fitness"].tolist()
+    ]
+
+
+def save_checkpoint(
+    path: str, generation: int, population: list, hof, logbook, state: dict
+) -> None:
+    """
+    Saves the state of a GA run to a compressed .npz file.
+    Population and hall of fame genomes are stored as packed arrays, together with their fitness values; the RNG
+    states, the logbook and the loop state are pickled in a byte array. The file is replaced atomically.
+    :param path: the file path
+    :param generation: the last completed generation
+    :param population: the list of individuals
+    :param hof: the hall of fame
+    :param logbook: the logbook
+    :param state: additional loop state (early stopping, fitness cache, ...)
+    """
+    blob = pickle.dumps(
+        {
+            "numpy_rng": np.random.get_state(),
+            "python_rng": random.getstate(),
+            "logbook": logbook,
+            "state": state,
+        }
+    )
+    arrays = {
+        "generation": np.array(generation),
+        "blob": np.frombuffer(blob, dtype=np.uint8),
+        **_pack_fitness(population, "population"),
+        **_pack_fitness(hof, "hof"),
+        **_pack_genomes([ind[0] for ind in population], "population"),
+        **_pack_genomes([ind[0] for ind in hof], "hof"),
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str) -> dict:
+    """
+    Loads the state of a GA run saved by 'save_checkpoint', and restores the RNG states.
+    Checkpoints embed pickled data: only load files you trust.
+    :param path: the file path
+    :return: a dictionary with the generation, the population and hall of fame genomes with their fitness
+        values, the logbook and the loop state
+    """
+    with np.load(path, allow_pickle=True) as data:
+        blob = pickle.loads(data["blob"].tobytes())
+        checkpoint = {
+            "generation": int(data["generation"]),
+            "population": _unpack_genomes(data, "population"),
+            "fitness": _unpack_fitness(data, "population"),
+            "hof": _unpack_genomes(data, "hof"),
+            "hof_fitness": _unpack_fitness(data, "hof"),
+            "logbook": blob["logbook"],
+            "state": blob["state"],
+        }
+    np.random.set_state(blob["numpy_rng"])
+    random.setstate(blob["python_rng"])
+    return checkpoint
@@ -1,30 +1,53 @@
 __all__ = ["FairNet"]
 
-import networkx as nx
+from contextlib import contextmanager
+from typing import Tuple
 
 from .marginalization import *
 from .genetic import *
 from .viz import *
 from .edges import *
+from .solvers import *
+from .index import GraphIndex
+from .overlay import EdgeDelta, OverlayGraph
+from .streaming import MarginalizationTracker
+from .profiling import Profiler, NULL_PROFILER
+from .progress import notify
 
 import warnings
 
 
 class FairNet(object):
-    def __init__(self, g: nx.Graph, attrs: dict):
+    def __init__(self, g, attrs: dict = None):
         """
         Initialize the FairNet object.
         Throws a warning if 'attrs' lacks attribute values for any node.
 
-        :param g: The graph
-        :param attrs: The node-to-attribute value dict
+        :param g: The graph, or a GraphIndex of it: FairNet objects built from the same index share its arrays,
+            and the graph is not copied
+        :param attrs: The node-to-attribute value dict; if None, the attributes of the index are used
 
         """
-        self.g = g.copy()
-        self.attrs = {k: v for k, v in attrs.items()}
+        self._owns_graph = not isinstance(g, GraphIndex)  # whether updates may modify g
+        if attrs is None and (self._owns_graph or g.attrs is None):
+            raise ValueError(
+                "The attribute values are required, unless the GraphIndex was built with them"
+            )
+        if isinstance(g, GraphIndex):
+            self.g = g.g  # None for indexes loaded from disk
+            if attrs is None:
+                self.attrs = {k: v for k, v in g.attrs.items()}
+                self.index = g
+            else:
+                self.attrs = {k: v for k, v in attrs.items()}
+                self.index = g.with_attrs(self.attrs)
+        else:
+            self.g = g.copy()
+            self.attrs = {k: v for k, v in attrs.items()}
+            self.index = GraphIndex(self.g, self.attrs)
 
         self.missing = [
-            n for n in self.g.nodes() if n not in self.attrs
+            n for n in self.index.nodes if n not in self.attrs
         ]  # nodes with missing values
         if len(self.missing) > 0:
             warnings.warn(
@@ -46,17 +69,38 @@ class FairNet(object):
 
         self.logbook = None  # GA logbook
         self.solution = None  # GA best solution
-        self.fair_g = None  # fair graph
+        self.delta = None  # edges added/removed by the solution
+        self._fair_g = None  # fair graph, built on demand
 
-    def __label_encoder(self):
-        enc = dict()
+        self._tracker = None  # incremental scores, see the update methods
+        self._stale = False  # whether the graph changed since the index was built
+        self._delta_outdated = (
+            False  # whether the graph changed since the delta was computed
+        )
+
+        self.progress = (
+            None  # progress callback, None for silence (see fairnet.progress)
+        )
+        self.profiler = NULL_PROFILER  # see 'profile'
+        self.profile_report = None  # report of the last profiled block
+
+    @property
+    def disc_nodes(self):
+        """
+        The marginalized nodes.
+        """
+        return None if self._disc is None else list(self._disc)
 
-        known = []
-        for _, v in self.attrs.items():
-            if v not in known:
-                known.append(v)
-            enc[known.index(v)] = v
-        return enc
+    @disc_nodes.setter
+    def disc_nodes(self, nodes):
+        self._disc = None if nodes is None else dict.fromkeys(nodes)
+
+    def __label_encoder(self):
+        """
+        Returns the code-to-label dict of the integer label encoding, taken from the index, where the codes of
+        the nodes are stored as an array (index.codes). Labels are only decoded at the API boundary.
+        """
+        return dict(enumerate(self.index.labels))
 
     def fit(self, thresh: float) -> object:
         """
@@ -66,14 +110,46 @@ class FairNet(object):
         """
 
         self.thresh = thresh
-
-        self.weights = compute_weights(self.attrs)
-        self.marg_dict = compute_marginalization_scores(
-            self.g, self.attrs, self.weights
-        )
-        self.disc_nodes = get_marginalized_nodes(self.marg_dict, self.thresh)
+        self._refresh_index()
+        self._tracker = None
+
+        with self.profiler.phase("fit"):
+            self.weights = compute_weights(self.attrs)
+            self.marg_dict = dict(
+                zip(
+                    self.index.nodes,
+                    self.index.marginalization_scores(self.weights).tolist(),
+                )
+            )
+            self.disc_nodes = get_marginalized_nodes(self.marg_dict, self.thresh)
         return self
 
+    @contextmanager
+    def profile(self, hook=None, memory: bool = True):
+        """
+        Context manager profiling the methods called within it: the wall time, number of calls and peak
+        allocations of each phase (fit, index, plausible_edges, removable_edges, evaluator, solver, fair_graph,
+        and, for each GA generation, initialization, selection, variation, evaluation, statistics, migration,
+        checkpoint), and the number of fitness evaluations. The report is stored in 'profile_report' on exit.
+        The island model is profiled as a whole.
+
+            with fn.profile() as profiler:
+                fn.run(...)
+            fn.profile_report["phases"]["evaluation"]
+
+        :param hook: function called with a dict for every completed phase, see Profiler
+        :param memory: whether to trace the peak allocations (with tracemalloc, which slows the run down)
+        :return: the Profiler
+        """
+        profiler = Profiler(hook=hook, memory=memory)
+        previous, self.profiler = self.profiler, profiler
+        try:
+            with profiler:
+                yield profiler
+        finally:
+            self.profiler = previous
+            self.profile_report = profiler.report()
+
     def run(
         self,
         fitness: str,
@@ -82,6 +158,11 @@ class FairNet(object):
         to_remove: float = None,
         GA_params: dict = None,
         display: bool = True,
+        streaming: bool = False,
+        resume_from: str = None,
+        solver: str = "ga",
+        solver_params: dict = None,
+        progress=None,
     ):
         """
         Executes the algorithm to reduce marginalization.
@@ -91,34 +172,66 @@ class FairNet(object):
         :param to_remove: the percentage of edges to remove among the removable ones
         :param GA_params: the dictionary of parameters for the genetic algorithm
         :param display: whether to display the GA evaluation
+        :param streaming: whether to select the candidate edges with a bounded memory footprint, without
+            materializing the whole pool of plausible/removable edges
+        :param resume_from: the path of a GA checkpoint (see the 'CHECKPOINT' GA parameter) to resume from
+        :param solver: either 'ga' (genetic algorithm), 'greedy' or 'local_search'; the latter two are much
+            faster, and usually find worse solutions
+        :param solver_params: the dictionary of parameters for the greedy and local search solvers, see
+            SOLVER_PARAMS
+        :param progress: the progress callback, called with a dict for each candidate batch and GA generation
+            (see fairnet.progress for the adapters to logging and tqdm); None for silence
         :return:
         """
+        if solver not in ("ga", "greedy", "local_search"):
+            raise ValueError("'solver' must be one of 'ga', 'greedy', 'local_search'")
 
         self.fitness = fitness
         self.strategy = strategy.lower()
         self.to_remove = to_remove
         self.to_add = to_add
+        self.progress = progress
+        self._refresh_index()
 
         if self.strategy[0] in "ab":
-            edges = get_plausible_edges(self)
+            with self.profiler.phase("plausible_edges"):
+                edges = get_plausible_edges(self, streaming=streaming)
             self.candidates.extend(edges)
 
         if self.strategy[0] in "rb":
             if not isinstance(self.to_remove, float):
                 raise ValueError("You must set the 'to_remove' parameter")
-            edges = get_removable_edges(self)
+            with self.profiler.phase("removable_edges"):
+                edges = get_removable_edges(self, streaming=streaming)
             self.candidates.extend(edges)
-        print(f"Starting GA over {len(self.candidates)} candidates...")
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            g, logbook, individual = reduce_marginalization_genetic(self, GA_params)
+        notify(
+            self.progress,
+            "start",
+            solver=solver,
+            fitness=self.fitness,
+            candidates=len(self.candidates),
+        )
+        with self.profiler.phase("solver"):
+            if solver == "greedy":
+                logbook, individual = greedy_solver(self, solver_params)
+            elif solver == "local_search":
+                logbook, individual = local_search_solver(self, solver_params)
+            else:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    logbook, individual = reduce_marginalization_genetic(
+                        self, GA_params, resume_from=resume_from
+                    )
 
-        self.fair_g = g
         self.logbook = logbook
+        notify(self.progress, "end", solver=solver, stop=logbook[-1].get("stop"))
 
         self.solution = []
         indexes = [i for i, j in enumerate(individual) if j == 1]
         self.solution = [self.candidates[i] for i in indexes]
+        self.delta = EdgeDelta.from_toggled(self.index, self.solution)
+        self._fair_g = None
+        self._delta_outdated = False
         if display:
             plot_GA_eval(logbook=logbook, fitness=self.fitness)
 
@@ -132,7 +245,7 @@ class FairNet(object):
         print("\nWeights:", self.weights)
 
         print(
-            f"\nMarginalized nodes:, {len(self.disc_nodes)} ({round(len(self.disc_nodes) * 100 / len(self.g), 2)}%)"
+            f"\nMarginalized nodes:, {len(self.disc_nodes)} ({round(len(self.disc_nodes) * 100 / len(self.marg_dict), 2)}%)"
         )
 
         print(
@@ -145,7 +258,13 @@ class FairNet(object):
         return (len(self.disc_nodes), network_marginalization_score(self.marg_dict))
 
     def replace_missing_values(
-        self, thresh: float, fitness: str, GA_params=None, display=True
+        self,
+        thresh: float,
+        fitness: str,
+        GA_params=None,
+        display=True,
+        resume_from: str = None,
+        progress=None,
     ):
         """
         Replaces missing values so as to minimize marginalization.
@@ -153,21 +272,120 @@ class FairNet(object):
         :param fitness: either 'marg' or 'nodes'
         :param GA_params: the dictionary of parameters for the genetic algorithm
         :param display: whether to display the GA evaluation
+        :param resume_from: the path of a GA checkpoint (see the 'CHECKPOINT' GA parameter) to resume from
+        :param progress: the progress callback, called with a dict for each GA generation; None for silence
         :return:
         """
         self.thresh = thresh
         self.fitness = fitness.lower()
-        with warnings.catch_warnings():
+        self.progress = progress
+        self._refresh_index()
+        notify(
+            self.progress,
+            "start",
+            solver="missing_values",
+            fitness=self.fitness,
+            candidates=len(self.missing),
+        )
+        with self.profiler.phase("solver"), warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            attrs, logbook = replace_missing_values_genetic(self, GA_params=GA_params)
+            attrs, logbook = replace_missing_values_genetic(
+                self, GA_params=GA_params, resume_from=resume_from
+            )
 
         self.attrs = attrs
+        self.index = self.index.with_attrs(attrs)
+        self.enc = self.__label_encoder()
+        self._tracker = None
         self.logbook = logbook
         self.missing = []
+        notify(self.progress, "end", solver="missing_values", stop=logbook[-1]["stop"])
 
         if display:
             plot_GA_eval(logbook=logbook, fitness=self.fitness)
 
+    def _refresh_index(self) -> None:
+        """
+        Rebuilds the index if the graph changed through the update methods.
+        """
+        if self._stale:
+            with self.profiler.phase("index"):
+                self.index = GraphIndex(self.g, self.attrs)
+            self._stale = False
+
+    def _update(self, method: str, *args) -> list:
+        """
+        Applies a graph update through the MarginalizationTracker.
+        The first update copies the graph if it is shared with a GraphIndex (or builds it, if the index has no
+        graph); the index is rebuilt when fitting or running again.
+        """
+        if self.marg_dict is None:
+            raise ValueError(
+                "The FairNet object must be fitted before updating the graph"
+            )
+        if self._tracker is None:
+            self._refresh_index()
+            self._tracker = MarginalizationTracker(self)
+        if not self._owns_graph:
+            if self.g is None:
+                delta = EdgeDelta([], [], self.index.directed)
+                self.g = OverlayGraph(self.index, delta).to_networkx()
+            else:
+                self.g = self.g.copy()
+            self._owns_graph = True
+        self._stale = True
+        self._delta_outdated = self.delta is not None
+        self._fair_g = None
+        return self._tracker.net_events(getattr(self._tracker, method)(*args))
+
+    def add_edge(self, u, v) -> list:
+        """
+        Adds an edge and updates the marginalization scores of its endpoints. Missing endpoints are added
+        without attribute value.
+        :param u: the first endpoint
+        :param v: the second endpoint
+        :return: the list of ThresholdEvent, for the nodes that crossed the marginalization threshold
+        """
+        return self._update("add_edge", u, v)
+
+    def remove_edge(self, u, v) -> list:
+        """
+        Removes an edge and updates the marginalization scores of its endpoints.
+        :param u: the first endpoint
+        :param v: the second endpoint
+        :return: the list of ThresholdEvent, for the nodes that crossed the marginalization threshold
+        """
+        return self._update("remove_edge", u, v)
+
+    def add_node(self, node, attr=None) -> list:
+        """
+        Adds a node. A labeled node changes the weights of all the labels, so that every node may be rescored
+        (once per group of nodes with the same label and counts).
+        :param node: the node
+        :param attr: the attribute value of the node, None if missing
+        :return: the list of ThresholdEvent, for the nodes that crossed the marginalization threshold
+        """
+        return self._update("add_node", node, attr)
+
+    def remove_node(self, node) -> list:
+        """
+        Removes a node and its edges. As for 'add_node', removing a labeled node changes all the weights.
+        :param node: the node
+        :return: the list of ThresholdEvent, for the nodes that crossed the marginalization threshold; the
+            removed node is reported with a new score of None, if it was marginalized
+        """
+        return self._update("remove_node", node)
+
+    def set_attribute(self, node, attr) -> list:
+        """
+        Changes the attribute value of a node, and updates the scores of the node, of the nodes whose
+        neighborhood contains it, and of the nodes whose label weight changed.
+        :param node: the node
+        :param attr: the new attribute value
+        :return: the list of ThresholdEvent, for the nodes that crossed the marginalization threshold
+        """
+        return self._update("set_attribute", node, attr)
+
     def get_modified_edges(self):
         """
         Returns the edges that have been added or removed by the algorithm.
@@ -175,12 +393,54 @@ class FairNet(object):
         """
         return self.solution
 
+    @property
+    def fair_g(self):
+        """
+        The fair graph, built on first access (see 'get_fair_graph'). It may be assigned a graph, which is
+        returned instead until the next run or graph update.
+        """
+        return self.get_fair_graph()
+
+    @fair_g.setter
+    def fair_g(self, g):
+        self._fair_g = g
+
     def get_fair_graph(self):
         """
         Returns the fair graph, i.e., the graph with the added/removed edges.
-        :return:
+        The graph is copied and modified on the first call only; use 'get_fair_view' to avoid the copy.
+        Throws a ValueError if the graph was updated (see 'add_edge' and the other update methods) after 'run'.
+        :return: the fair graph, or None if the algorithm has not been run
+        """
+        if self._fair_g is not None:
+            return self._fair_g
+        if self.delta is None:
+            return None
+        self._check_delta()
+        with self.profiler.phase("fair_graph"):
+            self._fair_g = self.get_fair_view().to_networkx()
+        return self._fair_g
+
+    def get_fair_view(self):
         """
-        return self.fair_g
+        Returns a read-only view of the fair graph, i.e., the original graph plus the edge delta, without copying.
+        Throws a ValueError if the graph was updated after 'run', as for 'get_fair_graph'.
+        :return: the OverlayGraph, or None if the algorithm has not been run
+        """
+        if self.delta is None:
+            return None
+        self._check_delta()
+        return OverlayGraph(self.index, self.delta)
+
+    def _check_delta(self) -> None:
+        """
+        Throws a ValueError if the edge delta was computed on a graph that has been updated since.
+        """
+        if self._delta_outdated:
+            raise ValueError(
+                "The graph was updated after 'run': the solution refers to the previous graph, run the "
+                "algorithm again to get the fair graph"
+            )
 
     def get_attributes(self):
         """
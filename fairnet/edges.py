@@ -1,73 +1,228 @@
-import networkx as nx
-from tqdm import tqdm
+import numpy as np
+
+from .progress import notify
 
 __all__ = ["get_plausible_edges", "get_removable_edges"]
 
 
-def get_plausible_edges(fn: object) -> list:
+def _graph_arrays(fn: object) -> tuple:
     """
-    compute the pool of plausible edges to add to the graph
+    Returns the array representation of the fitted FairNet object, taken from its GraphIndex.
     :param fn: the FairNet object
-    :return: the list of plausible edges
+    :return: a tuple (nodes, index, adjacency, codes, scores), where index maps nodes to their position and
+        scores holds the marginalization scores in node order
+    """
+    nodes, index = fn.index.nodes, fn.index.node_index
+    scores = np.array([fn.marg_dict[node] for node in nodes], dtype=float)
+    return nodes, index, fn.index.adj, fn.index.codes, scores
+
+
+def _select_smallest(batches, fraction: float, size: int) -> tuple:
     """
-    # pool of edges to add
-    plausible = nx.Graph()  # stores plausible links
-
-    for node in tqdm(fn.disc_nodes):
-        neighs = set(fn.g.neighbors(node))  # + [node]
-        neighs2 = set(nx.ego_graph(fn.g, node, center=False, radius=2).nodes())
-        neighs2 = neighs2.difference(neighs)
-        for n in neighs2:
-            if fn.strategy.endswith("g"):
-                if fn.is_marginalized(n):
-                    n_neighs = set(fn.g.neighbors(n))
-                    weight = len(neighs.intersection(n_neighs))
-                    if fn.marg_dict[node] > 0 and fn.marg_dict[n] > 0:
-                        if fn.attrs[n] != fn.attrs[node]:
-                            plausible.add_edge(node, n, weight=weight)
-                    elif fn.marg_dict[node] < 0 and fn.marg_dict[n] < 0:
-                        if fn.attrs[n] == fn.attrs[node]:
-                            plausible.add_edge(node, n, weight=weight)
-
-            else:  # local
-                n_neighs = set(fn.g.neighbors(n))
-                weight = len(neighs.intersection(n_neighs))
-                plausible.add_edge(node, n, weight=weight)
-    edges = sorted(plausible.edges(data=True), key=lambda t: t[2].get("weight", 1))
-
-    return edges[: round(len(edges) * fn.to_add)]
-
-
-def get_removable_edges(fn: object) -> list:
+    Streaming selection of the given fraction of candidate edges with the smallest weights.
+    Batches go through a chunked argpartition keeping the k = fraction * size smallest candidates, so that at
+    most k + batch size candidates are held at once.
+    Ties are broken by arrival order, as in a stable sort of the whole pool.
+    :param batches: iterable of (rows, cols, weights) arrays
+    :param fraction: the fraction of candidates to keep
+    :param size: the number of candidates
+    :return: a tuple (rows, cols, weights) of the kept candidates, sorted by weight
+    """
+    k = round(size * fraction)
+    kept = [np.zeros(0, dtype=np.int64) for _ in range(3)]
+    kept_keys = np.zeros(0, dtype=np.int64)
+    seen = 0
+    for rows, cols, weights in batches:
+        keys = np.asarray(weights, dtype=np.int64) * (size + 1) + np.arange(
+            seen, seen + len(weights)
+        )
+        seen += len(weights)
+        kept_keys = np.concatenate([kept_keys, keys])
+        kept = [np.concatenate(pair) for pair in zip(kept, (rows, cols, weights))]
+        if len(kept_keys) > k:
+            top = np.argpartition(kept_keys, k)[:k]
+            kept_keys = kept_keys[top]
+            kept = [a[top] for a in kept]
+
+    if seen != size:
+        raise ValueError("The number of candidates changed during the selection")
+    order = np.argsort(kept_keys)
+    return tuple(a[order] for a in kept)
+
+
+def _select(batches, fraction: float, streaming: bool) -> tuple:
     """
-    compute the pool of removable edges
+    Keeps the given fraction of candidate edges with the smallest weights.
+    :param batches: function returning an iterable of (rows, cols, weights) arrays, taking whether to compute
+        the weights; without weights, it yields (rows, cols, None)
+    :param fraction: the fraction of candidates to keep
+    :param streaming: if True, the pool of candidates is never materialized: a first pass counts the
+        candidates, without weights, and a second one selects them, see '_select_smallest'
+    :return: a tuple (rows, cols, weights) of the kept candidates, sorted by weight
+    """
+    if streaming:
+        size = sum(len(r) for r, _, _ in batches(False))
+        return _select_smallest(batches(True), fraction, size)
+
+    rows, cols, weights = [], [], []
+    for r, c, w in batches(True):
+        rows.append(r)
+        cols.append(c)
+        weights.append(w)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.int64)
+
+    keep = np.argsort(weights, kind="stable")[: round(len(weights) * fraction)]
+    return rows[keep], cols[keep], weights[keep]
+
+
+def _plausible_batches(fn: object, batch_size: int, weighted: bool = True):
+    """
+    Generates the plausible edges in batches of marginalized nodes.
     :param fn: the FairNet object
-    :return: the list of removable edges
+    :param batch_size: the number of marginalized nodes processed at once
+    :param weighted: whether to compute the weights and report the progress; if False, weights are None
+    :return: generator of (rows, cols, weights) tuples
     """
+    nodes, index, adj, codes, scores = _graph_arrays(fn)
+    directed = fn.index.directed
+    adj_t = adj.T.tocsr() if directed else adj
+    marginalized = np.abs(scores) > fn.thresh
 
-    edges = dict()
+    disc = np.array([index[node] for node in fn.disc_nodes], dtype=np.int64)
+    rank = np.full(len(nodes), len(disc), dtype=np.int64)  # position in disc_nodes
+    rank[disc] = np.arange(len(disc))
 
-    for e in fn.g.edges():
-        weight = len(set(fn.g.neighbors(e[0])).intersection(set(fn.g.neighbors(e[1]))))
-        edges[e] = weight
+    n_batches = -(-len(disc) // batch_size)
+    for i, start in enumerate(range(0, len(disc), batch_size)):
+        batch = disc[start : start + batch_size]
+        reach = (adj[batch] @ adj).tocoo()  # paths of length 2
+        local, c = reach.row, reach.col
+        r = batch[local]
+        keep = (c != r) & (np.asarray(adj[r, c]).ravel() == 0)  # distance 2
 
-    removable = dict()
+        if fn.strategy.endswith("g"):
+            same = codes[r] == codes[c]
+            keep &= marginalized[c] & (
+                ((scores[r] > 0) & (scores[c] > 0) & ~same)
+                | ((scores[r] < 0) & (scores[c] < 0) & same)
+            )
 
-    if fn.strategy.endswith("g"):
-        for k, v in edges.items():
-            if fn.is_marginalized(k[0]) and fn.is_marginalized(k[1]):
-                if fn.attrs[k[0]] == fn.attrs[k[1]]:
-                    if fn.attrs[k[0]] == fn.attrs[k[1]]:
-                        removable[k] = v
-                elif fn.marg_dict[k[0]] < 0:
-                    if fn.attrs[k[0]] != fn.attrs[k[1]]:
-                        removable[k] = v
+        # pairs of marginalized nodes are found twice: keep them once, from the node listed first
+        later = keep & (rank[c] < rank[r])
+        if directed and later.any():
+            # unless the node listed first does not reach the other one
+            rev = np.asarray(adj[c[later]].multiply(adj_t[r[later]]).sum(axis=1))
+            found = np.zeros(len(c), dtype=bool)
+            found[later] = (rev.ravel() > 0) & (
+                np.asarray(adj[c[later], r[later]]).ravel() == 0
+            )
+            later &= found
+        keep &= ~later
 
-    else:  # local
-        for k, v in edges.items():
-            if fn.is_marginalized(k[0]) or fn.is_marginalized(k[1]):
-                removable[k] = v
+        if not weighted:
+            yield r[keep], c[keep], None
+            continue
+        if directed:
+            weight = np.asarray((adj[batch] @ adj_t)[local[keep], c[keep]]).ravel()
+        else:
+            weight = reach.data[keep]
+        yield r[keep], c[keep], weight
+        notify(
+            fn.progress,
+            "candidates",
+            stage="plausible_edges",
+            done=i + 1,
+            total=n_batches,
+        )
 
-    removable = dict(sorted(removable.items(), key=lambda item: item[1]))
 
-    return list(removable.keys())[: round(len(removable) * fn.to_remove)]
+def get_plausible_edges(
+    fn: object, batch_size: int = 1024, streaming: bool = False
+) -> list:
+    """
+    compute the pool of plausible edges to add to the graph, i.e., the pairs of nodes at distance 2 from a
+    marginalized node, weighted by their number of common neighbors (triadic closure).
+    Pairs and weights are read from the sparse product A[disc_nodes] @ A, computed in batches of rows.
+    :param fn: the FairNet object
+    :param batch_size: the number of marginalized nodes processed at once
+    :param streaming: if True, keep the 'to_add' fraction of edges with a bounded selection instead of
+        materializing and sorting the whole pool
+    :return: the list of plausible edges
+    """
+    nodes = fn.index.nodes
+    rows, cols, weights = _select(
+        lambda weighted: _plausible_batches(fn, batch_size, weighted),
+        fn.to_add,
+        streaming,
+    )
+    return [
+        (nodes[r], nodes[c], {"weight": int(w)}) for r, c, w in zip(rows, cols, weights)
+    ]
+
+
+def _removable_batches(fn: object, batch_size: int, weighted: bool = True):
+    """
+    Generates the removable edges in batches of rows of the adjacency matrix.
+    Edges are filtered by the marginalization masks first; then, the GraphIndex counts the triangles closed by
+    the remaining ones only.
+    :param fn: the FairNet object
+    :param batch_size: the number of nodes whose edges are processed at once
+    :param weighted: whether to compute the weights and report the progress; if False, weights are None
+    :return: generator of (rows, cols, weights) tuples
+    """
+    nodes, index, adj, codes, scores = _graph_arrays(fn)
+    marginalized = np.abs(scores) > fn.thresh
+
+    n_batches = -(-len(nodes) // batch_size)
+    for i, start in enumerate(range(0, len(nodes), batch_size)):
+        block = adj[start : start + batch_size]
+        r = start + np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+        c = block.indices.astype(np.int64)
+        # each undirected edge once, from its endpoint listed first
+        if not fn.index.directed:
+            upper = c >= r
+            r, c = r[upper], c[upper]
+
+        if fn.strategy.endswith("g"):
+            keep = (
+                marginalized[r]
+                & marginalized[c]
+                & ((codes[r] == codes[c]) | (scores[r] < 0))
+            )
+        else:  # local
+            keep = marginalized[r] | marginalized[c]
+        r, c = r[keep], c[keep]
+        if not weighted:
+            yield r, c, None
+            continue
+        yield r, c, fn.index.edge_triangles(r, c)
+        notify(
+            fn.progress,
+            "candidates",
+            stage="removable_edges",
+            done=i + 1,
+            total=n_batches,
+        )
+
+
+def get_removable_edges(
+    fn: object, batch_size: int = 1024, streaming: bool = False
+) -> list:
+    """
+    compute the pool of removable edges, i.e., the edges of marginalized nodes, weighted by the number of
+    triangles they close
+    :param fn: the FairNet object
+    :param batch_size: the number of nodes whose edges are processed at once
+    :param streaming: if True, keep the 'to_remove' fraction of edges with a bounded selection instead of
+        materializing and sorting the whole pool
+    :return: the list of removable edges
+    """
+    nodes = fn.index.nodes
+    rows, cols, _ = _select(
+        lambda weighted: _removable_batches(fn, batch_size, weighted),
+        fn.to_remove,
+        streaming,
+    )
+    return [(nodes[r], nodes[c]) for r, c in zip(rows, cols)]
@@ -1,94 +1,882 @@
+import hashlib
+import multiprocessing
+import os
+import pickle
+import queue
+import random
+import time
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import numpy as np
+import scipy.sparse as sp
 from deap import creator, base, tools
 from .marginalization import *
+from .genome import PackedGenome, cx_two_point, mut_flip_bit
+from .checkpoint import save_checkpoint, load_checkpoint
+from .profiling import NULL_PROFILER
+from .progress import notify
+
+__all__ = [
+    "FitnessCache",
+    "MarginalizationEvaluator",
+    "MissingValuesEvaluator",
+    "reduce_marginalization_genetic",
+    "replace_missing_values_genetic",
+]
+
+
+DEFAULT_GA_PARAMS = {
+    "NUM_GENERATIONS": 30,
+    "POPULATION_SIZE": 150,
+    "CXPB": 0.5,
+    "MUTPB": 0.25,
+    "N_JOBS": 1,  # number of worker processes evaluating the fitness, -1 for all cores
+    "BATCH_EVAL": True,  # evaluate the whole population at once, when supported
+    "CACHE_SIZE": 4096,  # number of fitness values kept in the LRU cache, 0 to disable it
+    "PATIENCE": None,  # stop after this many generations without improvement of the best fitness
+    "MIN_DELTA": 0.0,  # minimum decrease of the best fitness counted as an improvement
+    "TIME_LIMIT": None,  # stop after this many seconds
+    "TARGET_FITNESS": None,  # stop as soon as the best fitness reaches this value (e.g., 0 marginalized nodes)
+    "CHECKPOINT": None,  # path of the checkpoint file, None to disable checkpointing
+    "CHECKPOINT_EVERY": 1,  # number of generations between two checkpoints
+    "ISLANDS": 1,  # number of sub-populations evolving on separate processes (edge GA only)
+    "MIGRATION_INTERVAL": 5,  # number of generations between two migrations
+    "MIGRANTS": 2,  # number of individuals each island sends at each migration
+    "TOPOLOGY": "ring",  # migration topology, either 'ring' or 'random'
+    "SEED_GREEDY": 0.0,  # fraction of the initial population seeded greedily (edge GA only)
+    "SEED_WEIGHTED": 0.0,  # fraction of the initial population seeded by candidate weight (edge GA only)
+}
+
+_worker_evaluate = None  # evaluation function of the current worker process
+_worker_evaluate_batch = None  # batch evaluation function of the current worker process
+
+
+def _init_worker(evaluate, batch: bool = False) -> None:
+    """
+    Initializes a worker process of the evaluation pool.
+    The evaluation function, and the read-only state it carries, is shipped once per worker.
+    :param evaluate: the evaluation function
+    :param batch: whether to evaluate batches of genomes with its 'evaluate_batch' method
+    """
+    global _worker_evaluate, _worker_evaluate_batch
+    _worker_evaluate = evaluate
+    _worker_evaluate_batch = evaluate.evaluate_batch if batch else None
 
-__all__ = ["reduce_marginalization_genetic", "replace_missing_values_genetic"]
+
+def _evaluate_in_worker(genome) -> tuple:
+    """
+    Evaluates a genome in a worker process of the evaluation pool.
+    :param genome: the genome of the individual
+    :return: the fitness values
+    """
+    return _worker_evaluate((genome,))
 
 
-def random_individual(fn: object) -> list:
+def _evaluate_batch_in_worker(genomes: list) -> list:
     """
-    generates a random individual for the GA
-    :param fn: the FairNet object
-    :return: a list of 0s and 1s, where 1s
+    Evaluates a batch of genomes in a worker process of the evaluation pool.
+    :param genomes: the list of genomes
+    :return: the list of fitness values
     """
+    return _worker_evaluate_batch(genomes)
 
-    return list(np.random.choice(a=[0, 1], size=(len(fn.candidates))))
 
+@contextmanager
+def fitness_map(evaluate, n_jobs: int = 1, batch: bool = False):
+    """
+    Context manager providing the function that evaluates a list of genomes.
+    With n_jobs > 1 (or -1, for all cores) genomes are evaluated on a process pool, whose workers receive the
+    evaluation function once at start-up: only genomes and fitness values travel with each task.
+    :param evaluate: the evaluation function, taking a DEAP individual
+    :param n_jobs: the number of worker processes
+    :param batch: whether to evaluate the genomes with the 'evaluate_batch' method of the evaluation function,
+        taking a list of genomes, instead of one by one, on one slice of the genomes per worker
+    :return: a function mapping a list of genomes to the list of their fitness values
+    """
+    if n_jobs is None or n_jobs == -1:
+        n_jobs = os.cpu_count()
 
-def evaluate_marginalization(
-    individual: tuple,
-    fn: object,
-    return_net: bool,
+    if n_jobs <= 1:
+        if batch:
+            yield evaluate.evaluate_batch
+        else:
+            yield lambda genomes: [evaluate((genome,)) for genome in genomes]
+        return
+
+    with multiprocessing.Pool(
+        n_jobs, initializer=_init_worker, initargs=(evaluate, batch)
+    ) as pool:
+        if batch:
+            yield lambda genomes: [
+                fit
+                for fitnesses in pool.map(
+                    _evaluate_batch_in_worker,
+                    [
+                        genomes[
+                            len(genomes)
+                            * i
+                            // n_jobs : len(genomes)
+                            * (i + 1)
+                            // n_jobs
+                        ]
+                        for i in range(n_jobs)
+                    ],
+                )
+                for fit in fitnesses
+            ]
+        else:
+            yield lambda genomes: pool.map(
+                _evaluate_in_worker,
+                genomes,
+                chunksize=max(1, len(genomes) // (4 * n_jobs)),
+            )
+
+
+def genome_key(genome) -> bytes:
+    """
+    Returns a hash of the genome, used as key of the fitness cache.
+    :param genome: a packed genome, an array, or a list of genes
+    :return: the 16-byte digest
+    """
+    if hasattr(genome, "tobytes"):
+        data = genome.tobytes() + len(genome).to_bytes(8, "little")
+    else:
+        data = pickle.dumps(tuple(genome))
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class FitnessCache(object):
+    def __init__(self, maxsize: int):
+        """
+        LRU cache of fitness values, keyed by the hash of the genomes.
+
+        :param maxsize: the maximum number of fitness values to keep
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key: bytes):
+        """
+        Returns the cached fitness values of a genome, or None.
+        :param key: the genome key
+        :return: the fitness values
+        """
+        fit = self._data.get(key)
+        if fit is not None:
+            self._data.move_to_end(key)
+        return fit
+
+    def put(self, key: bytes, fit: tuple) -> None:
+        """
+        Stores the fitness values of a genome, evicting the least recently used ones if needed.
+        :param key: the genome key
+        :param fit: the fitness values
+        """
+        self._data[key] = fit
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+def _evaluate_invalid(
+    individuals: list, evaluate_genomes, cache: FitnessCache = None
 ) -> tuple:
     """
-    Evaluation function for the GA.
-    It computes the marginalization score of the network after applying the solution.
-    :param individual:
-    :param fn:
-    :param return_net:
-    :return:
+    Evaluates the individuals with an invalid fitness.
+    Genomes found in the cache, or already evaluated in the same call, are not evaluated again.
+    :param individuals: the list of individuals
+    :param evaluate_genomes: the function mapping a list of genomes to their fitness values
+    :param cache: the fitness cache, if any
+    :return: a tuple (hits, misses) with the number of fitness values taken from the cache and evaluated
     """
-    individual = individual[0]  # <- because DEAP
+    invalid_ind = [ind for ind in individuals if not ind.fitness.valid]
+    if cache is None:
+        fitnesses = evaluate_genomes([ind[0] for ind in invalid_ind])
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        return 0, len(invalid_ind)
+
+    keys = [genome_key(ind[0]) for ind in invalid_ind]
+    known = dict()
+    to_evaluate = dict()
+    for ind, key in zip(invalid_ind, keys):
+        if key in known or key in to_evaluate:
+            continue
+        fit = cache.get(key)
+        if fit is None:
+            to_evaluate[key] = ind[0]
+        else:
+            known[key] = fit
+
+    fitnesses = evaluate_genomes(list(to_evaluate.values()))
+    for key, fit in zip(to_evaluate, fitnesses):
+        cache.put(key, fit)
+        known[key] = fit
+
+    for ind, key in zip(invalid_ind, keys):
+        ind.fitness.values = known[key]
+
+    misses = len(to_evaluate)
+    hits = len(invalid_ind) - misses
+    cache.hits += hits
+    cache.misses += misses
+    return hits, misses
+
+
+class EarlyStopping(object):
+    def __init__(self, GA_params: dict):
+        """
+        Convergence detection for the GA loop, driven by the PATIENCE, MIN_DELTA, TIME_LIMIT and
+        TARGET_FITNESS parameters. Fitness values are minimized.
+
+        :param GA_params: the GA parameters
+        """
+        self.patience = GA_params["PATIENCE"]
+        self.min_delta = GA_params["MIN_DELTA"]
+        self.time_limit = GA_params["TIME_LIMIT"]
+        self.target = GA_params["TARGET_FITNESS"]
+
+        self.best = None  # best fitness so far
+        self.stall = 0  # generations without improvement
+        self.elapsed = 0.0  # seconds spent in previous runs, when resumed
+        self.start = time.monotonic()
+
+    def update(self, best: float):
+        """
+        Updates the state with the best fitness of a generation.
+        :param best: the best fitness
+        :return: the reason to stop ('target', 'stall' or 'time'), or None
+        """
+        if self.best is None or best < self.best - self.min_delta:
+            self.best = best
+            self.stall = 0
+        else:
+            self.stall += 1
 
-    eva_g = fn.g.copy()  # copy of OG network, modified for testing the solution
+        if self.target is not None and best <= self.target:
+            return "target"
+        if self.patience is not None and self.stall >= self.patience:
+            return "stall"
+        if self.time_limit is not None:
+            if self.elapsed + time.monotonic() - self.start >= self.time_limit:
+                return "time"
+        return None
 
-    indexes = [i for i, j in enumerate(individual) if j == 1]
 
-    all_edges = [fn.candidates[i][:2] for i in indexes]
+def _record(
+    logbook, gen, pop, hof, stats, extra_record, cache, hits, misses, progress, total
+):
+    """
+    Appends the statistics of a generation to the logbook, and sends them to the progress callback.
+    """
+    record = stats.compile(pop) if stats else {}
+    extra = extra_record(hof) if extra_record else {}
+    if cache is not None:
+        extra.update(hits=hits, misses=misses)
+    logbook.record(gen=gen, **extra, **record)
+    notify(progress, "generation", **logbook[-1], total=total)
 
-    affected = set()  # nodes affected by tested solution
-    for u, v in all_edges:
-        affected.add(u)
-        affected.add(v)
 
-    for e in all_edges:
-        if eva_g.has_edge(*e):
-            eva_g.remove_edge(*e)
-        else:
-            eva_g.add_edge(*e)
+def _checkpoint(GA_params, gen, pop, hof, logbook, stopping, cache, reason) -> None:
+    """
+    Saves a checkpoint of the GA loop, if checkpointing is enabled and due at this generation.
+    """
+    if GA_params["CHECKPOINT"] is None or gen % GA_params["CHECKPOINT_EVERY"] != 0:
+        return
+    state = {
+        "best": stopping.best,
+        "stall": stopping.stall,
+        "elapsed": stopping.elapsed + time.monotonic() - stopping.start,
+        "reason": reason,
+        "cache": None,
+    }
+    if cache is not None:
+        state["cache"] = (list(cache._data.items()), cache.hits, cache.misses)
+    save_checkpoint(GA_params["CHECKPOINT"], gen, pop, hof, logbook, state)
+
+
+def _resume(path: str, toolbox, hof, stopping, cache) -> tuple:
+    """
+    Restores the GA loop from a checkpoint, RNG states included.
+    :return: a tuple (generation, population, logbook, reason to stop)
+    """
+    template = toolbox.individual()  # before restoring the RNG states
+    checkpoint = load_checkpoint(path)
+    if len(checkpoint["population"][0]) != len(template[0]):
+        raise ValueError(
+            f"The checkpoint holds genomes of {len(checkpoint['population'][0])} genes, "
+            f"while the current run expects {len(template[0])}"
+        )
 
-    num_marg_nodes = (
-        0  # amount of marginalized nodes in network after applying the solution
-    )
+    pop = []
+    for genome, fit in zip(checkpoint["population"], checkpoint["fitness"]):
+        ind = type(template)([genome])
+        ind.fitness.values = fit
+        pop.append(ind)
+    for genome, fit in zip(checkpoint["hof"], checkpoint["hof_fitness"]):
+        ind = type(template)([genome])
+        ind.fitness.values = fit
+        hof.insert(ind)
+
+    state = checkpoint["state"]
+    stopping.best, stopping.stall = state["best"], state["stall"]
+    stopping.elapsed = state["elapsed"]
+    if cache is not None and state["cache"] is not None:
+        items, cache.hits, cache.misses = state["cache"]
+        cache._data = OrderedDict(items)
+
+    return checkpoint["generation"], pop, checkpoint["logbook"], state["reason"]
+
+
+def _run_ga(
+    toolbox,
+    GA_params: dict,
+    header: list,
+    extra_record=None,
+    resume_from=None,
+    migrate=None,
+    profiler=None,
+    progress=None,
+) -> tuple:
+    """
+    Runs the generational loop shared by the GAs.
+    The toolbox must register 'individual', 'population', 'evaluate', 'mate', 'mutate' and 'select'; if the
+    registered evaluation function has an 'evaluate_batch' method, whole populations are evaluated at once.
+    :param toolbox: the DEAP toolbox
+    :param GA_params: the GA parameters
+    :param header: the logbook header
+    :param extra_record: function returning additional logbook fields from the hall of fame
+    :param resume_from: the path of a checkpoint to resume the run from
+    :param migrate: function called with (generation, population, hall of fame) after each generation but the
+        last one, which may replace individuals and return a reason to stop
+    :param profiler: the Profiler measuring the phases of each generation, if any
+    :param progress: the progress callback, called with the record of each generation, see fairnet.progress
+    :return: a tuple (hall of fame, logbook); the last logbook record tells why the run stopped ('stop' field)
+    """
+    NUM_GENERATIONS = GA_params["NUM_GENERATIONS"]  # numero di generazioni
+    POPULATION_SIZE = GA_params["POPULATION_SIZE"]  # popolazione per gen
 
-    fair_marg = []  # marg score of network after applying the solution
-    for node in eva_g.nodes():
-        marg = individual_marginalization_score(eva_g, node, fn.attrs, fn.weights)
-        fair_marg.append(abs(marg))
-        if abs(marg) > fn.thresh:
-            num_marg_nodes += 1
+    CXPB, MUTPB = (
+        GA_params["CXPB"],
+        GA_params["MUTPB"],
+    )  # crossover and mutation probability
 
-    budget = sum(individual)
+    n_HOF = 1  # number of individuals to keep in the hall of fame
 
-    if return_net:
-        return eva_g, budget, individual
+    hof = tools.HallOfFame(n_HOF)
 
-    if fn.fitness == "nodes":
-        return num_marg_nodes, budget, np.mean(fair_marg)
-    else:  # fn.fitness == "marg":
-        return np.mean(fair_marg), budget, num_marg_nodes
-    # elif fn.fitness == "round":
-    #    return round(np.mean(fair_marg), 2), budget, num_marg_nodes
+    stats = tools.Statistics(lambda ind: ind.fitness.values[0])
+    stats.register("best", np.min, axis=0)
+    stats.register("avg", np.mean, axis=0)
+
+    logbook = tools.Logbook()
+    logbook.header = header
+
+    cache = None
+    if GA_params["CACHE_SIZE"] > 0:
+        cache = FitnessCache(GA_params["CACHE_SIZE"])
+        logbook.header = list(header) + ["hits", "misses"]
+
+    stopping = EarlyStopping(GA_params)
+    profiler = profiler or NULL_PROFILER
+
+    evaluate = (
+        toolbox.evaluate.func
+    )  # the registered evaluator, shipped once to each worker
+    with fitness_map(
+        evaluate,
+        GA_params["N_JOBS"],
+        GA_params["BATCH_EVAL"] and hasattr(evaluate, "evaluate_batch"),
+    ) as evaluate_genomes:
+        if resume_from is None:
+            with profiler.generation(0):
+                with profiler.phase("initialization"):
+                    pop = toolbox.population(n=POPULATION_SIZE)
+
+                with profiler.phase("evaluation"):
+                    hits, misses = _evaluate_invalid(pop, evaluate_genomes, cache)
+                profiler.count("evaluations", misses)
+
+                with profiler.phase("statistics"):
+                    hof.update(pop)
+                    _record(
+                        logbook,
+                        0,
+                        pop,
+                        hof,
+                        stats,
+                        extra_record,
+                        cache,
+                        hits,
+                        misses,
+                        progress,
+                        NUM_GENERATIONS,
+                    )
+
+                reason = stopping.update(hof[0].fitness.values[0])
+                with profiler.phase("checkpoint"):
+                    _checkpoint(
+                        GA_params, 0, pop, hof, logbook, stopping, cache, reason
+                    )
+            start = 1
+        else:
+            start, pop, logbook, reason = _resume(
+                resume_from, toolbox, hof, stopping, cache
+            )
+            start += 1
+
+        for gen in range(start, NUM_GENERATIONS + 1):
+            if reason is not None:
+                break
+
+            with profiler.generation(gen):
+                with profiler.phase("selection"):
+                    # Select the next generation individuals
+                    offspring = toolbox.select(pop, len(pop))
+                    # Clone the selected individuals
+                    offspring = list(map(toolbox.clone, offspring))
+
+                with profiler.phase("variation"):
+                    # Apply crossover and mutation on the offspring
+                    for child1, child2 in zip(offspring[::2], offspring[1::2]):
+                        if np.random.random_sample() < CXPB:
+                            toolbox.mate(child1[0], child2[0])
+                            del child1.fitness.values
+                            del child2.fitness.values
+
+                    for mutant in offspring:
+                        if np.random.random_sample() < MUTPB:
+                            toolbox.mutate(mutant[0])
+                            del mutant.fitness.values
+
+                with profiler.phase("evaluation"):
+                    # Evaluate the individuals with an invalid fitness
+                    hits, misses = _evaluate_invalid(offspring, evaluate_genomes, cache)
+                profiler.count("evaluations", misses)
+
+                with profiler.phase("statistics"):
+                    # Update the hall of fame with the generated individuals
+                    hof.update(offspring)
+
+                    # Replace the current population by the offspring
+                    pop[:] = offspring
+
+                    # Append the current generation statistics to the logbook
+                    _record(
+                        logbook,
+                        gen,
+                        pop,
+                        hof,
+                        stats,
+                        extra_record,
+                        cache,
+                        hits,
+                        misses,
+                        progress,
+                        NUM_GENERATIONS,
+                    )
+                reason = stopping.update(hof[0].fitness.values[0])
+                if migrate is not None and reason is None and gen < NUM_GENERATIONS:
+                    with profiler.phase("migration"):
+                        reason = migrate(gen, pop, hof)
+                with profiler.phase("checkpoint"):
+                    _checkpoint(
+                        GA_params, gen, pop, hof, logbook, stopping, cache, reason
+                    )
+
+    logbook[-1]["stop"] = reason or "generations"
+
+    hof.update(pop)
+    return hof, logbook
 
 
-def reduce_marginalization_genetic(fn: object, GA_params: dict = None) -> tuple:
+def toggled_genes(genome) -> np.ndarray:
+    """
+    Returns the positions of the genes set to 1.
+    :param genome: a packed genome, or a list of 0s and 1s
+    :return: the array of positions
+    """
+    if isinstance(genome, PackedGenome):
+        return genome.indices()
+    return np.flatnonzero(np.asarray(genome, dtype=bool))
+
+
+def greedy_genomes(evaluator, n: int) -> list:
+    """
+    Generates genomes toggling the candidate edges that most reduce marginalization at their endpoints,
+    ranked by their gain when toggled alone (first objective, then the other one, then weight). Each genome
+    toggles a random number of the top improving candidates.
+    :param evaluator: the MarginalizationEvaluator of the fitted FairNet object
+    :param n: the number of genomes
+    :return: the list of packed genomes
+    """
+    size = len(evaluator.u)
+    if n == 0 or size == 0:
+        return []
+    d_nodes, d_marg = evaluator.single_flip_gains()
+    if evaluator.fitness == "nodes":
+        primary, secondary = d_nodes, d_marg
+    else:
+        primary, secondary = d_marg, d_nodes
+    order = np.lexsort((-evaluator.weights, secondary, primary))
+    improving = order[
+        (primary[order] < 0) | ((primary[order] == 0) & (secondary[order] < 0))
+    ]
+
+    genomes = []
+    for _ in range(n):
+        k = np.random.randint(1, len(improving) + 1) if len(improving) > 0 else 0
+        genes = np.zeros(size, dtype=bool)
+        genes[improving[:k]] = True
+        genomes.append(PackedGenome.from_genes(genes))
+    return genomes
+
+
+def weighted_genomes(evaluator, n: int) -> list:
     """
-    _summary_
+    Generates genomes whose genes are set with probability proportional to the weight of their candidate edge
+    (plus one, so that no candidate is excluded). The expected fraction of toggled genes is drawn uniformly in
+    (0, 0.5] for each genome.
+    :param evaluator: the MarginalizationEvaluator of the fitted FairNet object
+    :param n: the number of genomes
+    :return: the list of packed genomes
+    """
+    size = len(evaluator.u)
+    if n == 0 or size == 0:
+        return []
+    weights = evaluator.weights + 1.0
+    weights /= weights.mean()
+
+    genomes = []
+    for _ in range(n):
+        rate = 0.5 * (1.0 - np.random.random_sample())
+        genes = np.random.random_sample(size) < np.minimum(rate * weights, 1.0)
+        genomes.append(PackedGenome.from_genes(genes))
+    return genomes
+
+
+def seeded_population(
+    n: int, individual, evaluator, greedy: float = 0.0, weighted: float = 0.0
+) -> list:
+    """
+    Generates the initial population of the edge GA: random individuals, a fraction of which is replaced by
+    greedy and weight-proportional genomes.
+    :param n: the population size
+    :param individual: the function generating a random individual
+    :param evaluator: the MarginalizationEvaluator of the fitted FairNet object
+    :param greedy: the fraction of greedy genomes
+    :param weighted: the fraction of weight-proportional genomes
+    :return: the list of individuals
+    """
+    if greedy < 0 or weighted < 0 or greedy + weighted > 1:
+        raise ValueError(
+            "'SEED_GREEDY' and 'SEED_WEIGHTED' must be non-negative and sum up to at most 1"
+        )
+    pop = [individual() for _ in range(n)]
+    seeds = greedy_genomes(evaluator, round(n * greedy)) + weighted_genomes(
+        evaluator, round(n * weighted)
+    )
+    for ind, genome in zip(pop, seeds):
+        ind[0] = genome
+    return pop
+
+
+class MarginalizationEvaluator(object):
+    def __init__(self, fn: object):
+        """
+        Incremental evaluator for the edge GA.
+        It keeps the per-node same-label counts and degrees of the original graph, so that an individual is
+        evaluated by applying its toggled edges as count deltas on their endpoints, without copying the graph.
+
+        :param fn: the fitted FairNet object, with its candidate edges
+        """
+        nodes, adj, codes = fn.index.nodes, fn.index.adj, fn.index.codes
+        self.n_nodes = len(nodes)
+        self.fitness = fn.fitness
+        self.thresh = fn.thresh
+        self.directed = fn.index.directed
+
+        self.node_weights = fn.index.node_weights(fn.weights)
+        self.same, self.degree = fn.index.label_counts()
+        self.abs_marg = np.abs(
+            marginalization_scores_from_counts(
+                self.same, self.degree, self.node_weights
+            )
+        )
+        self.total_marg = self.abs_marg.sum()
+        self.num_marg_nodes = int(np.count_nonzero(self.abs_marg > self.thresh))
+
+        index = fn.index.node_index
+        self.u = np.array([index[e[0]] for e in fn.candidates], dtype=np.int64)
+        self.v = np.array([index[e[1]] for e in fn.candidates], dtype=np.int64)
+        if len(fn.candidates) > 0:
+            exists = np.asarray(adj[self.u, self.v]).ravel() != 0
+        else:
+            exists = np.zeros(0, dtype=bool)
+        self.sign = np.where(exists, -1, 1)  # existing edges are removed
+        self.same_label = codes[self.u] == codes[self.v]
+        # triadic-closure weights (common neighbors), used to seed the population
+        self.weights = fn.index.edge_triangles(self.u, self.v)
+
+        # a candidate listed twice is toggled twice, i.e., left untouched
+        if self.directed:
+            keys = np.stack([self.u, self.v], axis=1)
+        else:
+            keys = np.sort(np.stack([self.u, self.v], axis=1), axis=1)
+        self.edge_ids = None
+        if len(keys) > 0:
+            _, first, edge_ids = np.unique(
+                keys, axis=0, return_index=True, return_inverse=True
+            )
+            if len(first) < len(keys):
+                self.first = first
+                self.edge_ids = edge_ids.ravel()
+
+        self._incidence = None  # built on the first batch evaluation
+
+    def selected(self, toggled: np.ndarray) -> np.ndarray:
+        """
+        Returns the indexes of the candidate edges toggled by a genome, once each.
+        :param toggled: the positions of the genes set to 1
+        :return: the array of candidate indexes
+        """
+        selected = toggled
+        if self.edge_ids is not None and len(selected) > 0:
+            ids, counts = np.unique(self.edge_ids[selected], return_counts=True)
+            selected = self.first[ids[counts % 2 == 1]]
+        return selected
+
+    def endpoint_deltas(self, candidates: np.ndarray, sign: np.ndarray = None) -> tuple:
+        """
+        Lists the count deltas caused on their endpoints by the given candidate edges: on the source node and,
+        in undirected graphs, on the other endpoint too, unless the edge is a self-loop.
+        :param candidates: the indexes of the candidate edges
+        :param sign: the per-candidate count deltas (+1 to add the edge, -1 to remove it), the original ones if
+            None
+        :return: a tuple (positions, nodes, same-label count deltas, degree deltas) of arrays, where positions
+            index the given candidates
+        """
+        positions = np.arange(len(candidates))
+        nodes = self.u[candidates]
+        d_degree = self.sign[candidates] if sign is None else sign
+        d_same = d_degree * self.same_label[candidates]
+        if not self.directed:
+            other = nodes != self.v[candidates]
+            positions = np.concatenate([positions, positions[other]])
+            nodes = np.concatenate([nodes, self.v[candidates][other]])
+            d_degree = np.concatenate([d_degree, d_degree[other]])
+            d_same = np.concatenate([d_same, d_same[other]])
+        return positions, nodes, d_same, d_degree
+
+    def delta(
+        self,
+        selected: np.ndarray,
+        same: np.ndarray = None,
+        degree: np.ndarray = None,
+        sign: np.ndarray = None,
+    ) -> tuple:
+        """
+        Applies the toggled candidate edges as count deltas.
+        By default, the deltas are applied to the original graph; the solvers pass their current counts.
+        :param selected: the indexes of the toggled candidate edges
+        :param same: the per-node same-label counts
+        :param degree: the per-node degrees
+        :param sign: the per-candidate count deltas, see 'endpoint_deltas'
+        :return: a tuple (affected, same, degree) with the affected nodes and their updated counts
+        """
+        same = self.same if same is None else same
+        degree = self.degree if degree is None else degree
+        _, nodes, d_same, d_degree = self.endpoint_deltas(selected, sign)
+
+        affected, inverse = np.unique(nodes, return_inverse=True)
+        same = same[affected] + np.bincount(
+            inverse, weights=d_same, minlength=len(affected)
+        ).astype(np.int64)
+        degree = degree[affected] + np.bincount(
+            inverse, weights=d_degree, minlength=len(affected)
+        ).astype(np.int64)
+        return affected, same, degree
+
+    def scores(self, selected: np.ndarray) -> tuple:
+        """
+        Computes the aggregate marginalization of the network after toggling the selected candidate edges.
+        :param selected: the indexes of the toggled candidate edges
+        :return: a tuple (number of marginalized nodes, network marginalization score)
+        """
+        affected, same, degree = self.delta(selected)
+        new_abs = np.abs(
+            marginalization_scores_from_counts(
+                same, degree, self.node_weights[affected]
+            )
+        )
+        old_abs = self.abs_marg[affected]
+        num_marg_nodes = (
+            self.num_marg_nodes
+            - np.count_nonzero(old_abs > self.thresh)
+            + np.count_nonzero(new_abs > self.thresh)
+        )
+        total_marg = self.total_marg - old_abs.sum() + new_abs.sum()
+        return num_marg_nodes, total_marg / self.n_nodes
+
+    def single_flip_gains(
+        self,
+        candidates: np.ndarray = None,
+        same: np.ndarray = None,
+        degree: np.ndarray = None,
+        sign: np.ndarray = None,
+    ) -> tuple:
+        """
+        Computes, for each candidate edge, the change in marginalization caused by toggling it alone.
+        By default, the changes are computed on the original graph; the solvers pass their current counts.
+        :param candidates: the indexes of the candidate edges, all of them if None
+        :param same: the per-node same-label counts
+        :param degree: the per-node degrees
+        :param sign: the per-candidate count deltas (+1 to add the edge, -1 to remove it)
+        :return: a tuple (change in the number of marginalized nodes, change in the sum of |IMS|) of arrays
+        """
+        if candidates is None:
+            candidates = np.arange(len(self.u))
+        same = self.same if same is None else same
+        degree = self.degree if degree is None else degree
+        positions, nodes, d_same, d_degree = self.endpoint_deltas(candidates, sign)
+
+        weights = self.node_weights[nodes]
+        old_abs = np.abs(
+            marginalization_scores_from_counts(same[nodes], degree[nodes], weights)
+        )
+        new_abs = np.abs(
+            marginalization_scores_from_counts(
+                same[nodes] + d_same, degree[nodes] + d_degree, weights
+            )
+        )
+        crossed = (new_abs > self.thresh).astype(np.int64) - (
+            old_abs > self.thresh
+        ).astype(np.int64)
+        d_nodes = np.bincount(
+            positions, weights=crossed, minlength=len(candidates)
+        ).astype(np.int64)
+        d_marg = np.bincount(
+            positions, weights=new_abs - old_abs, minlength=len(candidates)
+        )
+        return d_nodes, d_marg
+
+    def _fitness(self, num_marg_nodes: int, budget: int, marg: float) -> tuple:
+        if self.fitness == "nodes":
+            return num_marg_nodes, budget, marg
+        else:  # fn.fitness == "marg":
+            return marg, budget, num_marg_nodes
+
+    def __call__(self, individual: tuple) -> tuple:
+        """
+        Evaluation function for the GA.
+        :param individual: the DEAP individual
+        :return: the fitness values
+        """
+        toggled = toggled_genes(individual[0])  # <- because DEAP
+        num_marg_nodes, marg = self.scores(self.selected(toggled))
+        return self._fitness(num_marg_nodes, len(toggled), marg)
+
+    def incidence(self) -> tuple:
+        """
+        Returns the candidate-to-node incidence matrix used by the batch evaluation.
+        Toggling candidate e changes the degree of each of its endpoints by d and their same-label count by s,
+        with d, s in {-1, 0, 1}: the matrix stores d + K * s, where K exceeds twice the number of candidates
+        incident to any node, so that the deltas summed over a genome can be told apart.
+        :return: a tuple (incidence matrix, K, number of candidates incident to a node at most)
+        """
+        if self._incidence is None:
+            rows, u, d_same, d_degree = self.endpoint_deltas(np.arange(len(self.u)))
+            bound = int(np.bincount(u).max()) if len(u) > 0 else 0
+            K = 2 * bound + 1
+            matrix = sp.csr_array(
+                (d_degree + K * d_same, (rows, u)),
+                shape=(len(self.u), self.n_nodes),
+                dtype=np.int64,
+            )
+            self._incidence = matrix, K, bound
+        return self._incidence
+
+    def evaluate_batch(self, genomes: list) -> list:
+        """
+        Evaluates a whole population at once.
+        The population is stacked into a (population x candidates) sparse matrix, whose product with the
+        incidence matrix gives the per-individual, per-node count deltas; the fitness values are then row
+        reductions over the affected nodes.
+        :param genomes: the list of genomes
+        :return: the list of fitness values
+        """
+        toggled = [toggled_genes(genome) for genome in genomes]
+        budgets = [len(t) for t in toggled]
+        pop = sp.csr_array(
+            (
+                np.ones(sum(budgets), dtype=np.int64),
+                np.concatenate(toggled) if toggled else np.zeros(0, dtype=np.int64),
+                np.concatenate([[0], np.cumsum(budgets)]),
+            ),
+            shape=(len(genomes), len(self.u)),
+        )
+        if self.edge_ids is not None:  # duplicated candidates count once, if odd
+            merge = sp.csr_array(
+                (
+                    np.ones(len(self.edge_ids), dtype=np.int64),
+                    (np.arange(len(self.edge_ids)), self.first[self.edge_ids]),
+                ),
+                shape=(len(self.u), len(self.u)),
+            )
+            pop = pop @ merge
+            pop.data %= 2
+
+        incidence, K, bound = self.incidence()
+        deltas = (pop @ incidence).tocsr()
+        deltas.eliminate_zeros()  # nodes whose counts do not change
+        rows = np.repeat(np.arange(len(genomes)), np.diff(deltas.indptr))
+        nodes = deltas.indices
+        d_same = np.floor_divide(deltas.data + bound, K)
+        d_degree = deltas.data - K * d_same
+
+        new_abs = np.abs(
+            marginalization_scores_from_counts(
+                self.same[nodes] + d_same,
+                self.degree[nodes] + d_degree,
+                self.node_weights[nodes],
+            )
+        )
+        old_abs = self.abs_marg[nodes]
+        d_total = np.bincount(rows, weights=new_abs - old_abs, minlength=len(genomes))
+        d_marg = np.bincount(
+            rows,
+            weights=(new_abs > self.thresh).astype(np.int64) - (old_abs > self.thresh),
+            minlength=len(genomes),
+        )
+
+        return [
+            self._fitness(
+                self.num_marg_nodes + int(d_marg[i]),
+                budgets[i],
+                (self.total_marg + d_total[i]) / self.n_nodes,
+            )
+            for i in range(len(genomes))
+        ]
+
 
-    :param fn: _description_
-    :param GA_params: _description_
-    :return: _description_
+def _edge_record(hof) -> dict:
     """
-    if GA_params is None:
-        GA_params = {
-            "NUM_GENERATIONS": 30,
-            "POPULATION_SIZE": 150,
-            "CXPB": 0.5,
-            "MUTPB": 0.25,
-        }
+    Returns the logbook fields of the edge GA taken from the hall of fame.
+    """
+    return {"budget": hof[0].fitness.values[1], "other": hof[0].fitness.values[2]}
 
-    return_net = False  # if True, eva function returns the fair network. INSIDE THE GA, IT MUST BE FALSE
 
+def _edge_toolbox(evaluator: MarginalizationEvaluator, GA_params: dict):
+    """
+    Creates the DEAP toolbox of the edge GA.
+    :param evaluator: the evaluator of the fitted FairNet object
+    :param GA_params: the GA parameters
+    :return: the toolbox
+    """
     creator.create(
         "Fitness", base.Fitness, weights=(-1.0, -1.0, -1.0)
     )  # fitness function
@@ -98,7 +886,7 @@ def reduce_marginalization_genetic(fn: object, GA_params: dict = None) -> tuple:
 
     toolbox = base.Toolbox()  # creiamo il toolbox
 
-    toolbox.register("random_individual", random_individual, fn)
+    toolbox.register("random_individual", PackedGenome.random, len(evaluator.u))
 
     toolbox.register(
         "individual",
@@ -108,185 +896,446 @@ def reduce_marginalization_genetic(fn: object, GA_params: dict = None) -> tuple:
         n=1,
     )
 
-    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
-
-    toolbox.register(
-        "evaluate", evaluate_marginalization, fn=fn, return_net=return_net
-    )  # funzione di valutazione. Vedi quanto detto sopra
-    toolbox.register("mate", tools.cxTwoPoint)  # funzione di crossover
     toolbox.register(
-        "mutate", tools.mutFlipBit, indpb=0.2
-    )  # funzione di mutazione custom
-    toolbox.register("select", tools.selTournament, tournsize=3)
-
-    NUM_GENERATIONS = GA_params["NUM_GENERATIONS"]  # numero di generazioni
-    POPULATION_SIZE = GA_params["POPULATION_SIZE"]  # popolazione per gen
+        "population",
+        seeded_population,
+        individual=toolbox.individual,
+        evaluator=evaluator,
+        greedy=GA_params["SEED_GREEDY"],
+        weighted=GA_params["SEED_WEIGHTED"],
+    )
 
-    CXPB, MUTPB = (
-        GA_params["CXPB"],
-        GA_params["MUTPB"],
-    )  # crossover and mutation probability
+    toolbox.register("evaluate", evaluator)  # incremental, without copying the graph
+    toolbox.register("mate", cx_two_point)  # funzione di crossover
+    toolbox.register("mutate", mut_flip_bit, indpb=0.2)  # funzione di mutazione custom
+    toolbox.register("select", tools.selTournament, tournsize=3)
+    return toolbox
 
-    n_HOF = 1  # number of individuals to keep in the hall of fame
 
-    pop = toolbox.population(n=POPULATION_SIZE)
+def _island(
+    island: int,
+    evaluator: MarginalizationEvaluator,
+    GA_params: dict,
+    seed: int,
+    inbox,
+    outbox,
+) -> None:
+    """
+    Worker process of the island model: evolves one sub-population. Every MIGRATION_INTERVAL generations it
+    sends its best individuals to the coordinator, and replaces its worst individuals with the migrants it
+    receives back.
+    :param island: the island number
+    :param evaluator: the evaluator of the fitted FairNet object
+    :param GA_params: the GA parameters of the island
+    :param seed: the seed of the island RNGs
+    :param inbox: the queue of messages from the coordinator
+    :param outbox: the queue of messages to the coordinator
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        toolbox = _edge_toolbox(evaluator, GA_params)
+
+    def migrate(gen, pop, hof):
+        if gen % GA_params["MIGRATION_INTERVAL"] != 0:
+            return None
+        best = tools.selBest(pop, GA_params["MIGRANTS"])
+        outbox.put(
+            (
+                "migrants",
+                island,
+                gen,
+                [(ind[0], ind.fitness.values) for ind in best],
+            )
+        )
+        migrants, reason = inbox.get()
+        worst = tools.selWorst(pop, len(migrants))
+        for ind, (genome, fit) in zip(worst, migrants):
+            ind[0] = genome
+            ind.fitness.values = fit
+        hof.update(pop)
+        return reason
+
+    hof, logbook = _run_ga(
+        toolbox,
+        GA_params,
+        header=["gen", "best", "avg", "other", "budget"],
+        extra_record=_edge_record,
+        migrate=migrate,
+    )
+    outbox.put(
+        ("done", island, [(ind[0], ind.fitness.values) for ind in hof], list(logbook))
+    )
 
-    hof = tools.HallOfFame(n_HOF)
 
-    stats = tools.Statistics(lambda ind: ind.fitness.values[0])
-    stats.register("best", np.min, axis=0)
-    stats.register("avg", np.mean, axis=0)
+def _run_islands(
+    evaluator: MarginalizationEvaluator, GA_params: dict, progress=None
+) -> tuple:
+    """
+    Runs the island model of the edge GA: ISLANDS sub-populations of POPULATION_SIZE individuals evolve on
+    separate processes, and exchange their MIGRANTS best individuals every MIGRATION_INTERVAL generations over
+    a 'ring' or 'random' TOPOLOGY. The coordinator (this process) routes the migrants and applies the early
+    stopping criteria to the global best fitness, at each migration.
+    :param evaluator: the evaluator of the fitted FairNet object
+    :param GA_params: the GA parameters
+    :param progress: the progress callback, called with the merged records once the islands are done
+    :return: a tuple (hall of fame, logbook), merged over the islands
+    """
+    n_islands = GA_params["ISLANDS"]
+    if GA_params["TOPOLOGY"] not in ("ring", "random"):
+        raise ValueError("'TOPOLOGY' must be either 'ring' or 'random'")
+
+    island_params = {
+        **GA_params,
+        "N_JOBS": 1,
+        "PATIENCE": None,
+        "TIME_LIMIT": None,
+        "TARGET_FITNESS": None,
+        "CHECKPOINT": None,
+    }
+    seeds = np.random.randint(0, 2**31 - 1, size=n_islands)
+    rng = np.random.RandomState(seeds[0] ^ 0x5EED)  # migration routes
+
+    ctx = multiprocessing.get_context()
+    outbox = ctx.Queue()
+    inboxes = [ctx.Queue() for _ in range(n_islands)]
+    workers = [
+        ctx.Process(
+            target=_island,
+            args=(i, evaluator, island_params, int(seeds[i]), inboxes[i], outbox),
+            daemon=True,
+        )
+        for i in range(n_islands)
+    ]
+    for worker in workers:
+        worker.start()
+
+    stopping = EarlyStopping(GA_params)
+    pending = dict()  # generation -> island -> migrants
+    results = dict()  # island -> (hall of fame, logbook)
+    reason = None
+    try:
+        while len(results) < n_islands:
+            try:
+                message = outbox.get(timeout=1)
+            except queue.Empty:
+                if any(w.exitcode not in (None, 0) for w in workers):
+                    raise RuntimeError("An island process terminated unexpectedly")
+                continue
+
+            if message[0] == "done":
+                _, island, hof, logbook = message
+                results[island] = (hof, logbook)
+                continue
+
+            _, island, gen, migrants = message
+            pending.setdefault(gen, dict())[island] = migrants
+            if len(pending[gen]) < n_islands:
+                continue
+
+            batches = pending.pop(gen)
+            best = min(fit[0] for batch in batches.values() for _, fit in batch)
+            reason = stopping.update(best)
+            if GA_params["TOPOLOGY"] == "ring":
+                sources = [(i - 1) % n_islands for i in range(n_islands)]
+            else:
+                sources = rng.permutation(n_islands)
+                while n_islands > 1 and np.any(sources == np.arange(n_islands)):
+                    sources = rng.permutation(n_islands)
+            for i in range(n_islands):
+                inboxes[i].put((batches[int(sources[i])], reason))
+    finally:
+        for worker in workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.terminate()
+
+    # global hall of fame
+    hof = tools.HallOfFame(1)
+    individuals = []
+    for island_hof, _ in results.values():
+        for genome, fit in island_hof:
+            ind = creator.Individual([genome])
+            ind.fitness.values = fit
+            individuals.append(ind)
+    hof.update(individuals)
 
+    # merged logbook: best and average over the islands, other and budget of the best island
     logbook = tools.Logbook()
-    logbook.header = "gen", "best", "avg", "other", "budget"
-
-    invalid_individuals = [ind for ind in pop if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_individuals)
-    for ind, fit in zip(invalid_individuals, fitnesses):
-        ind.fitness.values = fit
-
-    hof.update(pop)
-
-    record = stats.compile(pop)
-    logbook.record(
-        gen=0, budget=hof[0].fitness.values[1], other=hof[0].fitness.values[2], **record
-    )
-    print(logbook.stream)
-
-    for gen in range(1, NUM_GENERATIONS + 1):
-
-        # Select the next generation individuals
-        offspring = toolbox.select(pop, len(pop))
-        # Clone the selected individuals
-        offspring = list(map(toolbox.clone, offspring))
-
-        # Apply crossover and mutation on the offspring
-        for child1, child2 in zip(offspring[::2], offspring[1::2]):
-            if np.random.random_sample() < CXPB:
-                toolbox.mate(child1[0], child2[0])
-                del child1.fitness.values
-                del child2.fitness.values
-
-        for mutant in offspring:
-            if np.random.random_sample() < MUTPB:
-                toolbox.mutate(mutant[0])
-                del mutant.fitness.values
-
-        # Evaluate the individuals with an invalid fitness
-        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        fitnesses = map(toolbox.evaluate, invalid_ind)
-        for ind, fit in zip(invalid_ind, fitnesses):
-            ind.fitness.values = fit
+    logbook.header = ["gen", "best", "avg", "other", "budget"]
+    for records in zip(*[results[i][1] for i in range(n_islands)]):
+        top = min(records, key=lambda r: r["best"])
+        logbook.record(
+            gen=top["gen"],
+            best=top["best"],
+            avg=np.mean([r["avg"] for r in records]),
+            other=top["other"],
+            budget=top["budget"],
+            **(
+                {
+                    "hits": sum(r["hits"] for r in records),
+                    "misses": sum(r["misses"] for r in records),
+                }
+                if "hits" in top
+                else {}
+            ),
+        )
+    for record in logbook:
+        notify(progress, "generation", **record, total=GA_params["NUM_GENERATIONS"])
+    logbook[-1]["stop"] = reason or "generations"
+    return hof, logbook
 
-        # Update the hall of fame with the generated individuals
-        hof.update(offspring)
 
-        # Replace the current population by the offspring
-        pop[:] = offspring
+def reduce_marginalization_genetic(
+    fn: object, GA_params: dict = None, resume_from: str = None
+) -> tuple:
+    """
+    Runs the GA for reducing marginalization through edge additions/removals.
+    With ISLANDS > 1, it runs the island model (see '_run_islands').
 
-        # Append the current generation statistics to the logbook
-        record = stats.compile(pop) if stats else {}
-        logbook.record(
-            gen=gen,
-            budget=hof[0].fitness.values[1],
-            other=hof[0].fitness.values[2],
-            **record
+    :param fn: the fitted FairNet object, with its candidate edges
+    :param GA_params: the GA parameters, see DEFAULT_GA_PARAMS
+    :param resume_from: the path of a checkpoint to resume the run from
+    :return: a tuple (logbook, best genome); the fair graph is built on demand by FairNet
+    """
+    GA_params = {**DEFAULT_GA_PARAMS, **(GA_params or {})}
+
+    with fn.profiler.phase("evaluator"):
+        evaluator = MarginalizationEvaluator(fn)
+    toolbox = _edge_toolbox(evaluator, GA_params)
+
+    if GA_params["ISLANDS"] > 1:
+        if resume_from is not None or GA_params["CHECKPOINT"] is not None:
+            raise ValueError("Checkpoints are not supported by the island model")
+        with fn.profiler.phase("islands"):  # the islands are not profiled
+            hof, logbook = _run_islands(evaluator, GA_params, progress=fn.progress)
+    else:
+        hof, logbook = _run_ga(
+            toolbox,
+            GA_params,
+            header=["gen", "best", "avg", "other", "budget"],
+            extra_record=_edge_record,
+            resume_from=resume_from,
+            profiler=fn.profiler,
+            progress=fn.progress,
         )
-        print(logbook.stream)
 
-    hof.update(pop)
-    g, _, individual = evaluate_marginalization(hof.items[0], fn=fn, return_net=True)
-    return g, logbook, individual
+    return logbook, hof.items[0][0]
 
 
-def random_individual_missing(fn: object) -> list:
+def random_individual_missing(evaluator) -> list:
     """
-    generates a random individual for the GA (missing values)
-    :param fn: the FairNet object
-    :return: a list of 0s and 1s
+    generates a random individual for the GA (missing values): each missing node gets a label code drawn with
+    the frequency of the label among the known values
+    :param evaluator: the MissingValuesEvaluator of the FairNet object
+    :return: a list of label codes
     """
-    return list(np.random.choice(a=list(fn.attrs.values()), size=len(fn.missing)))
+    p = evaluator.known_counts / evaluator.known_counts.sum()
+    return np.random.choice(len(p), size=evaluator.n_missing, p=p).tolist()
 
 
-def mutate_missing(individual: tuple, indpb: float, fn: object) -> tuple:
+def mutate_missing(individual: list, indpb: float, n_labels: int) -> tuple:
     """
-    _summary_
+    Mutation of the missing values genomes, in place: each gene is replaced, with probability indpb, by another
+    label code drawn uniformly.
 
-    :param individual: _description_
-    :param indpb: _description_
-    :param fn: _description_
-    :return: _description_
+    :param individual: the list of label codes
+    :param indpb: the probability of mutating each gene
+    :param n_labels: the number of label codes
+    :return: a tuple with the genome
     """
+    if n_labels < 2:
+        return (individual,)
+    for i in np.flatnonzero(np.random.random_sample(len(individual)) < indpb):
+        code = np.random.randint(n_labels - 1)
+        individual[i] = int(code + (code >= individual[i]))  # skip the current one
+
+    return (individual,)
 
-    for i in range(len(individual)):
-        if np.random.random_sample() < indpb:
-            individual[i] = np.random.choice(
-                [
-                    attr
-                    for attr in set((list(fn.attrs.values())))
-                    if attr != individual[i]
-                ]
+
+class MissingValuesEvaluator(object):
+    def __init__(self, fn: object):
+        """
+        Incremental evaluator for the missing values GA, whose genes are the codes of the labels in self.labels
+        (the labels of the GraphIndex).
+        Only the missing nodes and their neighbors see their neighborhood change with the assigned labels: the
+        evaluator keeps their per-label neighbor counts, computed from the known labels, and applies a label
+        assignment as count deltas. Every other node is grouped by (label, same-label neighbors, degree), so that
+        the global weights, which move with the label counts, are applied once per group. fn.attrs is never
+        modified.
+
+        :param fn: the FairNet object, with its missing nodes
+        """
+        self.fitness = fn.fitness
+        self.thresh = fn.thresh
+
+        nodes, adj = fn.index.nodes, fn.index.adj
+        self.n_nodes = len(nodes)
+        self.n_attrs = len(fn.attrs) + len(fn.missing)
+        self.n_missing = len(fn.missing)
+
+        # genes are the label codes of the index
+        codes = fn.index.codes
+        self.labels = list(fn.index.labels)
+        known_counts = np.bincount(codes[codes >= 0], minlength=len(self.labels))
+        if len(fn.attrs) > known_counts.sum():  # values of nodes outside the graph
+            lookup = {label: i for i, label in enumerate(self.labels)}
+            extra = []
+            for node, attr in fn.attrs.items():
+                if node not in fn.index.node_index:
+                    if attr not in lookup:
+                        lookup[attr] = len(self.labels)
+                        self.labels.append(attr)
+                    extra.append(lookup[attr])
+            known_counts = np.bincount(
+                np.concatenate([codes[codes >= 0], np.array(extra, dtype=np.int64)]),
+                minlength=len(self.labels),
+            )
+        self.known_counts = known_counts
+        n_labels = len(self.labels)
+
+        index = fn.index.node_index
+        missing = np.array([index[node] for node in fn.missing], dtype=np.int64)
+        degree = np.diff(adj.indptr)
+
+        # nodes whose neighborhood contains a missing node
+        adj_t = adj.T.tocsr() if fn.index.directed else adj
+        pointing = adj_t[missing]
+        affected = np.unique(np.concatenate([missing, pointing.indices]))
+        self.pair_affected = np.searchsorted(affected, pointing.indices)
+        self.pair_gene = np.repeat(np.arange(len(missing)), np.diff(pointing.indptr))
+
+        known = codes >= 0
+        one_hot = sp.csr_array(
+            (
+                np.ones(np.count_nonzero(known), dtype=np.int64),
+                (np.flatnonzero(known), codes[known]),
+            ),
+            shape=(len(nodes), n_labels),
+        )
+        self.base_counts = (adj[affected] @ one_hot).toarray()
+        self.affected_degree = degree[affected]
+        self.affected_codes = codes[affected]
+        self.affected_gene = np.full(len(affected), -1, dtype=np.int64)
+        self.affected_gene[np.searchsorted(affected, missing)] = np.arange(len(missing))
+
+        # the other nodes, grouped by (label, same-label neighbors, degree)
+        others = np.ones(len(nodes), dtype=bool)
+        others[affected] = False
+        same, _ = neighbor_label_counts(adj, codes, n_labels)
+        groups, self.group_sizes = np.unique(
+            np.stack([codes[others], same[others], degree[others]], axis=1),
+            axis=0,
+            return_counts=True,
+        )
+        self.group_codes, self.group_same, self.group_degree = groups.T.reshape(3, -1)
+
+    def scores(self, assignment: np.ndarray) -> tuple:
+        """
+        Computes the aggregate marginalization of the network for a label assignment.
+        :param assignment: the label codes of the missing nodes
+        :return: a tuple (number of marginalized nodes, network marginalization score)
+        """
+        counts = self.known_counts + np.bincount(assignment, minlength=len(self.labels))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            label_weights = np.where(
+                counts > 0, 1 - (counts - 1) / (self.n_attrs - 1), np.nan
             )
 
-    return (individual,)
+        neighbor_counts = self.base_counts.copy()
+        np.add.at(neighbor_counts, (self.pair_affected, assignment[self.pair_gene]), 1)
+        affected_codes = np.where(
+            self.affected_gene >= 0,
+            assignment[self.affected_gene],
+            self.affected_codes,
+        )
+        same = neighbor_counts[np.arange(len(affected_codes)), affected_codes]
+        affected_marg = np.abs(
+            marginalization_scores_from_counts(
+                same, self.affected_degree, label_weights[affected_codes]
+            )
+        )
+        group_marg = np.abs(
+            marginalization_scores_from_counts(
+                self.group_same, self.group_degree, label_weights[self.group_codes]
+            )
+        )
+
+        num_marg_nodes = int(
+            np.count_nonzero(affected_marg > self.thresh)
+            + self.group_sizes[group_marg > self.thresh].sum()
+        )
+        total_marg = affected_marg.sum() + (group_marg * self.group_sizes).sum()
+        return num_marg_nodes, total_marg / self.n_nodes
+
+    def __call__(self, individual: tuple) -> tuple:
+        """
+        Evaluation function for the GA (missing values).
+        :param individual: the DEAP individual
+        :return: the fitness values
+        """
+        genome = individual[0]  # <- because DEAP
+        num_marg_nodes, overall_marg = self.scores(np.asarray(genome, dtype=np.int64))
 
+        if self.fitness == "marg":
+            return overall_marg, num_marg_nodes
+        else:  # fn.fitness == "nodes":
+            return num_marg_nodes, overall_marg
 
-def evaluate_missing(individual: tuple, fn: object, return_net: bool) -> tuple:
+
+def evaluate_missing(
+    individual: tuple,
+    fn: object,
+    return_net: bool,
+    evaluator: MissingValuesEvaluator = None,
+) -> tuple:
     """
-    Evaluation function for the GA (missing values).
+    Evaluation function for the GA (missing values), whose genes are label codes (see MissingValuesEvaluator).
+    If return_net is True, it returns the node-to-attribute value dict completed with the decoded solution.
     :param individual:
     :param fn:
     :param return_net:
+    :param evaluator: the incremental evaluator to use, built from fn if None
     :return:
     """
-    individual = individual[0]  # <- because DEAP
-
-    for node, attr in zip(fn.missing, individual):
-        fn.attrs[node] = attr
-
-    weights = compute_weights(fn.attrs)
-
-    marg_dict = compute_marginalization_scores(fn.g, fn.attrs, weights)
-
-    disc_nodes = [k for k, v in marg_dict.items() if abs(v) > fn.thresh]
-
-    overall_marg = np.mean(
-        [abs(v) for v in marg_dict.values()]
-    )  # network marginalization score
-
     if return_net:
-        return fn.attrs
+        if evaluator is None:
+            evaluator = MissingValuesEvaluator(fn)
+        attrs = {k: v for k, v in fn.attrs.items()}
+        for node, code in zip(fn.missing, individual[0]):  # <- because DEAP
+            attrs[node] = evaluator.labels[code]  # decoded
+        return attrs
 
-    if fn.fitness == "marg":
-        return overall_marg, len(disc_nodes)
-    else:  # fn.fitness == "nodes":
-        return len(disc_nodes), overall_marg
-    # elif fn.fitness == "round":
-    #   return round(np.mean(fair_marg), 2), budget, num_marg_nodes
+    if evaluator is None:
+        evaluator = MissingValuesEvaluator(fn)
+    return evaluator(individual)
 
 
-def replace_missing_values_genetic(fn: object, GA_params: dict = None) -> tuple:
+def replace_missing_values_genetic(
+    fn: object, GA_params: dict = None, resume_from: str = None
+) -> tuple:
     """
     Runs the GA for replacing missing values.
     :param fn: the FairNet object
-    :param GA_params: the GA parameters
+    :param GA_params: the GA parameters, see DEFAULT_GA_PARAMS
+    :param resume_from: the path of a checkpoint to resume the run from
     :return:
     """
 
-    if GA_params is None:
-        GA_params = {
-            "NUM_GENERATIONS": 30,
-            "POPULATION_SIZE": 150,
-            "CXPB": 0.5,
-            "MUTPB": 0.25,
-        }
+    GA_params = {**DEFAULT_GA_PARAMS, **(GA_params or {})}
 
     creator.create("Fitness", base.Fitness, weights=(-1.0, -1.0))
     creator.create("Individual", list, fitness=creator.Fitness)
 
     toolbox = base.Toolbox()
 
-    toolbox.register("random_individual_missing", random_individual_missing, fn=fn)
+    with fn.profiler.phase("evaluator"):
+        evaluator = MissingValuesEvaluator(fn)
+
+    toolbox.register(
+        "random_individual_missing", random_individual_missing, evaluator=evaluator
+    )
 
     toolbox.register(
         "individual",
@@ -299,88 +1348,23 @@ def replace_missing_values_genetic(fn: object, GA_params: dict = None) -> tuple:
     toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
     toolbox.register(
-        "evaluate_missing",
-        evaluate_missing,
-        fn=fn,
-        return_net=False,
-    )
+        "evaluate", evaluator
+    )  # same as evaluate_missing with return_net=False, without modifying fn.attrs
     toolbox.register("mate", tools.cxTwoPoint)
-    toolbox.register("mutate_missing", mutate_missing, indpb=0.05, fn=fn)
+    toolbox.register(
+        "mutate", mutate_missing, indpb=0.05, n_labels=len(evaluator.labels)
+    )
     toolbox.register("select", tools.selTournament, tournsize=3)
 
-    print("Fitness:", fn.fitness)
-    NUM_GENERATIONS = GA_params["NUM_GENERATIONS"]
-    POPULATION_SIZE = GA_params["POPULATION_SIZE"]
-
-    CXPB, MUTPB = (
-        GA_params["CXPB"],
-        GA_params["MUTPB"],
+    hof, logbook = _run_ga(
+        toolbox,
+        GA_params,
+        header=["gen", "best", "avg"],
+        resume_from=resume_from,
+        profiler=fn.profiler,
+        progress=fn.progress,
     )
 
-    n_HOF = 1
-
-    pop = toolbox.population(n=POPULATION_SIZE)
-
-    hof = tools.HallOfFame(n_HOF)
-
-    stats = tools.Statistics(lambda ind: ind.fitness.values[0])
-    stats.register("best", np.min, axis=0)
-    stats.register("avg", np.mean, axis=0)
-
-    logbook = tools.Logbook()
-    logbook.header = ["gen"] + stats.fields
-
-    invalid_individuals = [ind for ind in pop if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate_missing, invalid_individuals)
-    for ind, fit in zip(invalid_individuals, fitnesses):
-        ind.fitness.values = fit
-
-    hof.update(pop)
-
-    record = stats.compile(pop)
-    logbook.record(gen=0, **record)
-
-    print(logbook.stream)
-
-    for gen in range(1, NUM_GENERATIONS + 1):
-
-        # Select the next generation individuals
-        offspring = toolbox.select(pop, len(pop))
-        # Clone the selected individuals
-        offspring = list(map(toolbox.clone, offspring))
-
-        # Apply crossover and mutation on the offspring
-        for child1, child2 in zip(offspring[::2], offspring[1::2]):
-            if np.random.random_sample() < CXPB:
-                toolbox.mate(child1[0], child2[0])
-                del child1.fitness.values
-                del child2.fitness.values
-
-        for mutant in offspring:
-            if np.random.random_sample() < MUTPB:
-                toolbox.mutate_missing(mutant[0])
-                del mutant.fitness.values
-
-        # Evaluate the individuals with an invalid fitness
-        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        fitnesses = map(toolbox.evaluate_missing, invalid_ind)
-        for ind, fit in zip(invalid_ind, fitnesses):
-            ind.fitness.values = fit
-
-        # Update the hall of fame with the generated individuals
-        hof.update(offspring)
-
-        # Replace the current population by the offspring
-        pop[:] = offspring
-
-        # Append the current generation statistics to the logbook
-        record = stats.compile(pop) if stats else {}
-        logbook.record(gen=gen, **record)
-
-        print(logbook.stream)
-
-    hof.update(pop)
-
-    attrs = evaluate_missing(hof.items[0], fn=fn, return_net=True)
+    attrs = evaluate_missing(hof.items[0], fn=fn, return_net=True, evaluator=evaluator)
 
     return attrs, logbook
@@ -0,0 +1,147 @@
+import numpy as np
+
+__all__ = ["PackedGenome", "cx_two_point", "mut_flip_bit"]
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+class PackedGenome(object):
+    __slots__ = ("bits", "size")
+
+    def __init__(self, bits: np.ndarray, size: int):
+        """
+        Binary genome of the edge GA, stored as a packed array of bits (8 genes per byte).
+        It behaves as a sequence of 0s and 1s, so that it can be decoded as the list-based genomes.
+
+        :param bits: the packed uint8 array; padding bits must be 0
+        :param size: the number of genes
+        """
+        self.bits = bits
+        self.size = size
+
+    @classmethod
+    def random(cls, size: int) -> "PackedGenome":
+        """
+        Generates a genome whose genes are fair coin flips.
+        :param size: the number of genes
+        :return: the genome
+        """
+        bits = np.random.randint(0, 256, size=(size + 7) // 8, dtype=np.uint8)
+        if size % 8:
+            bits[-1] &= (0xFF << (8 - size % 8)) & 0xFF  # clear padding
+        return cls(bits, size)
+
+    @classmethod
+    def from_genes(cls, genes) -> "PackedGenome":
+        """
+        Packs a sequence of 0s and 1s.
+        :param genes: the sequence of genes
+        :return: the genome
+        """
+        genes = np.asarray(genes, dtype=bool)
+        return cls(np.packbits(genes), len(genes))
+
+    def to_array(self) -> np.ndarray:
+        """
+        Unpacks the genome.
+        :return: the uint8 array of genes
+        """
+        return np.unpackbits(self.bits, count=self.size)
+
+    def indices(self) -> np.ndarray:
+        """
+        Returns the positions of the genes set to 1.
+        :return: the array of positions
+        """
+        return np.flatnonzero(self.to_array())
+
+    def count(self) -> int:
+        """
+        Returns the number of genes set to 1.
+        :return: the number of 1s
+        """
+        return int(_POPCOUNT[self.bits].sum())
+
+    def tobytes(self) -> bytes:
+        return self.bits.tobytes()
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        genes = self.to_array()
+        return genes if dtype is None else genes.astype(dtype)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return iter(self.to_array().tolist())
+
+    def __getitem__(self, item):
+        return self.to_array()[item].tolist()
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PackedGenome):
+            return NotImplemented
+        return self.size == other.size and np.array_equal(self.bits, other.bits)
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo) -> "PackedGenome":
+        return PackedGenome(self.bits.copy(), self.size)
+
+    def __repr__(self) -> str:
+        return f"PackedGenome(size={self.size}, ones={self.count()})"
+
+
+def _range_mask(n_bytes: int, start: int, stop: int) -> np.ndarray:
+    """
+    Returns the packed mask of the genes in [start, stop).
+    :param n_bytes: the number of bytes of the genome
+    :param start: the first gene
+    :param stop: the gene after the last one
+    :return: the uint8 mask
+    """
+    mask = np.zeros(n_bytes, dtype=np.uint8)
+    first, last = start // 8, (stop - 1) // 8
+    mask[first : last + 1] = 0xFF
+    mask[first] &= 0xFF >> (start % 8)
+    mask[last] &= (0xFF << (7 - (stop - 1) % 8)) & 0xFF
+    return mask
+
+
+def cx_two_point(genome1: PackedGenome, genome2: PackedGenome) -> tuple:
+    """
+    Two-point crossover of packed genomes, in place: the genes between the two points are swapped.
+    Same semantics as deap.tools.cxTwoPoint.
+    :param genome1: the first genome
+    :param genome2: the second genome
+    :return: the two genomes
+    """
+    size = min(genome1.size, genome2.size)
+    if size < 2:
+        return genome1, genome2
+
+    cxpoint1 = np.random.randint(1, size + 1)
+    cxpoint2 = np.random.randint(1, size)
+    if cxpoint2 >= cxpoint1:
+        cxpoint2 += 1
+    else:  # Swap the two cx points
+        cxpoint1, cxpoint2 = cxpoint2, cxpoint1
+
+    n_bytes = min(len(genome1.bits), len(genome2.bits))
+    mask = _range_mask(n_bytes, cxpoint1, cxpoint2)
+    swap = (genome1.bits[:n_bytes] ^ genome2.bits[:n_bytes]) & mask
+    genome1.bits[:n_bytes] ^= swap
+    genome2.bits[:n_bytes] ^= swap
+    return genome1, genome2
+
+
+def mut_flip_bit(genome: PackedGenome, indpb: float) -> tuple:
+    """
+    Bit-flip mutation of a packed genome, in place: each gene is flipped with probability indpb.
+    Same semantics as deap.tools.mutFlipBit.
+    :param genome: the genome
+    :param indpb: the probability of flipping each gene
+    :return: a tuple with the genome
+    """
+    genome.bits ^= np.packbits(np.random.random_sample(genome.size) < indpb)
+    return (genome,)
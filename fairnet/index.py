@@ -0,0 +1,313 @@
+import os
+import pickle
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+from .marginalization import (
+    csr_adjacency,
+    marginalization_scores_from_counts,
+    neighbor_label_counts,
+)
+
+__all__ = ["GraphIndex"]
+
+
+def _open_array(path: str, dtype, size: int, mmap: bool) -> np.ndarray:
+    """
+    Opens a .npy array of the given size, created with zeros if the file does not exist. Memory-mapped arrays
+    are written back to the file, or kept in memory if the file is read-only.
+    """
+    if os.path.exists(path):
+        if not mmap:
+            return np.load(path)
+        try:
+            return np.load(path, mmap_mode="r+")
+        except OSError:  # read-only: copy on write
+            return np.load(path, mmap_mode="c")
+    if mmap:
+        try:
+            return np.lib.format.open_memmap(
+                path, mode="w+", dtype=dtype, shape=(size,)
+            )
+        except OSError:
+            pass
+    return np.zeros(size, dtype=dtype)
+
+
+class _TriangleCache(object):
+    def __init__(self, n_edges: int, path: str = None, mmap: bool = False):
+        """
+        Triangle counts of the edges of a graph, aligned to the CSR indices of its adjacency matrix, and the
+        bitmask of the computed ones. The arrays are allocated on first use; with a path, they are the
+        triangles.npy and computed.npy files of the directory of a saved index.
+
+        :param n_edges: the number of stored entries of the adjacency matrix
+        :param path: the directory of the saved index, if any
+        :param mmap: whether to memory-map the files
+        """
+        self.n_edges = n_edges
+        self.path = path
+        self.mmap = mmap
+        self.counts = None
+        # bit p & 7 of byte p >> 3 is set once counts[p] is computed
+        self.computed = None
+
+    def arrays(self) -> tuple:
+        """
+        Returns the arrays (counts, computed), allocating them if needed.
+        """
+        if self.counts is None:
+            size = (self.n_edges + 7) // 8
+            if self.path is None:
+                self.counts = np.zeros(self.n_edges, dtype=np.int64)
+                self.computed = np.zeros(size, dtype=np.uint8)
+            else:
+                self.counts = _open_array(
+                    os.path.join(self.path, "triangles.npy"),
+                    np.int64,
+                    self.n_edges,
+                    self.mmap,
+                )
+                self.computed = _open_array(
+                    os.path.join(self.path, "computed.npy"), np.uint8, size, self.mmap
+                )
+        return self.counts, self.computed
+
+
+class GraphIndex(object):
+    def __init__(self, g: nx.Graph, attrs: dict = None):
+        """
+        Array representation of a graph, built once and shared by the FairNet objects fitted on it: CSR
+        adjacency (with sorted rows), node-id mapping, degrees, integer-encoded labels and a cache of per-edge
+        triangle counts.
+        The graph is not copied, so it must not be modified after indexing. Indexes saved with 'save' are
+        loaded with 'load' as memory-mapped arrays, without any graph object (g is None).
+
+        :param g: the graph
+        :param attrs: the node-to-attribute value dict, if any
+        """
+        nodes, adj = csr_adjacency(g)
+        adj.sort_indices()
+        self._setup(g, nodes, adj, g.is_directed())
+        if attrs is not None:
+            self._encode(attrs)
+
+    def _setup(self, g, nodes: list, adj, directed: bool) -> None:
+        self.g = g
+        self.directed = directed
+        self.nodes, self.adj = nodes, adj
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.degree = np.diff(self.adj.indptr).astype(np.int64)
+        # per-edge triangle counts, shared with the indexes returned by 'with_attrs'
+        self._triangles = _TriangleCache(len(self.adj.indices))
+
+        self.attrs = None
+        self.labels = []  # distinct attribute values, in order of appearance
+        self.codes = np.full(len(self.nodes), -1, dtype=np.int64)  # -1: missing
+
+    @classmethod
+    def from_csr(
+        cls,
+        nodes: list,
+        adj,
+        directed: bool,
+        codes: np.ndarray = None,
+        labels: list = None,
+    ) -> "GraphIndex":
+        """
+        Builds an index from its arrays, without any graph object.
+        :param nodes: the node ids, in row order
+        :param adj: the CSR adjacency matrix, whose entries are 1, with sorted rows
+        :param directed: whether the graph is directed
+        :param codes: the label code of each node (-1: missing), if any
+        :param labels: the distinct attribute values, indexed by the codes
+        :return: the index
+        """
+        index = object.__new__(cls)
+        index._setup(None, nodes, adj, directed)
+        if codes is not None:
+            index.codes = codes
+            index.labels = list(labels)
+            index.attrs = {
+                node: index.labels[code]
+                for node, code in zip(nodes, codes.tolist())
+                if code >= 0
+            }
+        return index
+
+    def save(self, path: str) -> None:
+        """
+        Saves the index to a directory of .npy files (CSR indptr, indices and data, label codes, node ids, cached
+        triangle counts) and a small metadata file with the labels. Node ids and labels must be picklable;
+        integer node ids are stored as a plain array.
+        :param path: the directory path, created if needed
+        """
+        os.makedirs(path, exist_ok=True)
+        idx_dtype = np.int32 if len(self.adj.indices) < 2**31 else np.int64
+        np.save(os.path.join(path, "indptr.npy"), self.adj.indptr.astype(idx_dtype))
+        np.save(os.path.join(path, "indices.npy"), self.adj.indices.astype(idx_dtype))
+        np.save(os.path.join(path, "data.npy"), self.adj.data)
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        if all(
+            isinstance(n, (int, np.integer)) and not isinstance(n, bool)
+            for n in self.nodes
+        ):
+            nodes = np.array(self.nodes, dtype=np.int64)
+        else:  # 1-D, even if the ids are tuples
+            nodes = np.empty(len(self.nodes), dtype=object)
+            nodes[:] = self.nodes
+        np.save(os.path.join(path, "nodes.npy"), nodes, allow_pickle=True)
+        counts, computed = self._triangles.arrays()
+        np.save(os.path.join(path, "triangles.npy"), counts)
+        np.save(os.path.join(path, "computed.npy"), computed)
+        with open(os.path.join(path, "meta.pkl"), "wb") as f:
+            pickle.dump({"directed": self.directed, "labels": self.labels}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "GraphIndex":
+        """
+        Loads an index saved with 'save'. The CSR and label arrays are memory-mapped, so that graphs larger than
+        the available memory are paged in on demand; node ids are loaded in memory. Triangle counts computed
+        afterwards are written back to the directory, if writable. The metadata file is pickled: only load
+        directories you trust.
+        :param path: the directory path
+        :param mmap: whether to memory-map the arrays (read-only) instead of loading them
+        :return: the index, with g set to None
+        """
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in ["indptr", "indices", "data", "codes"]
+        }
+        nodes = np.load(os.path.join(path, "nodes.npy"), allow_pickle=True).tolist()
+        with open(os.path.join(path, "meta.pkl"), "rb") as f:
+            meta = pickle.load(f)
+
+        adj = sp.csr_array(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=(len(nodes), len(nodes)),
+            copy=False,
+        )
+        index = cls.from_csr(
+            nodes, adj, meta["directed"], arrays["codes"], meta["labels"]
+        )
+        index._triangles = _TriangleCache(len(adj.indices), path, mmap)
+        return index
+
+    def _encode(self, attrs: dict) -> None:
+        self.attrs = attrs
+        lookup = dict()
+        for i, node in enumerate(self.nodes):
+            if node not in attrs:
+                continue
+            attr = attrs[node]
+            if attr not in lookup:
+                lookup[attr] = len(self.labels)
+                self.labels.append(attr)
+            self.codes[i] = lookup[attr]
+
+    def with_attrs(self, attrs: dict) -> "GraphIndex":
+        """
+        Returns an index of the same graph with other attribute values, sharing the graph arrays.
+        :param attrs: the node-to-attribute value dict
+        :return: the new index
+        """
+        index = object.__new__(GraphIndex)
+        index.__dict__.update(self.__dict__)
+        index.labels = []
+        index.codes = np.full(len(self.nodes), -1, dtype=np.int64)
+        index._encode(attrs)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _edge_positions(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Finds the given edges in the CSR indices, by binary search in the sorted rows.
+        :param rows: the row indexes of the first endpoints
+        :param cols: the row indexes of the second endpoints
+        :return: the int64 array of positions, -1 for the pairs that are not edges
+        """
+        lo = self.adj.indptr[rows].astype(np.int64)
+        end = self.adj.indptr[rows + 1].astype(np.int64)
+        hi = end.copy()
+        active = lo < hi
+        while active.any():
+            mid = (lo + hi) // 2
+            smaller = np.zeros(len(lo), dtype=bool)
+            smaller[active] = self.adj.indices[mid[active]] < cols[active]
+            lo = np.where(active & smaller, mid + 1, lo)
+            hi = np.where(active & ~smaller, mid, hi)
+            active = lo < hi
+        found = lo < end
+        found[found] = self.adj.indices[lo[found]] == cols[found]
+        return np.where(found, lo, -1)
+
+    def edge_triangles(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Counts the triangles closed by the given pairs of nodes, i.e., the common (out-)neighbors of their
+        endpoints, as the size of the intersection of the adjacency rows. The counts of the pairs that are edges
+        are cached per edge and computed once, on the first request, so that FairNet objects sharing the index
+        (whatever their threshold or strategy) count each edge once; other pairs are counted on each request.
+        :param rows: the row indexes of the first endpoints
+        :param cols: the row indexes of the second endpoints
+        :return: the int64 array of counts
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if not self.directed:  # both orientations share the entry of the upper triangle
+            rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+
+        cache, computed = self._triangles.arrays()
+        pos = self._edge_positions(rows, cols)
+        edge = pos >= 0
+        done = np.zeros(len(rows), dtype=bool)
+        done[edge] = (computed[pos[edge] >> 3] >> (pos[edge] & 7)) & 1 == 1
+
+        counts = np.zeros(len(rows), dtype=np.int64)
+        counts[done] = cache[pos[done]]
+        todo = np.flatnonzero(~done)
+        step = 1 << 16
+        for start in range(0, len(todo), step):
+            i = todo[start : start + step]
+            counts[i] = np.asarray(
+                self.adj[rows[i]].multiply(self.adj[cols[i]]).sum(axis=1)
+            ).ravel()
+
+        new = pos[todo[edge[todo]]]
+        cache[new] = counts[todo[edge[todo]]]
+        np.bitwise_or.at(computed, new >> 3, (1 << (new & 7)).astype(np.uint8))
+        return counts
+
+    def label_counts(self) -> tuple:
+        """
+        Computes, for every node, the number of neighbors sharing its label and its degree.
+        :return: a tuple (same, degree) of integer arrays
+        """
+        same, _ = neighbor_label_counts(self.adj, self.codes, len(self.labels))
+        return same, self.degree
+
+    def node_weights(self, weights: dict) -> np.ndarray:
+        """
+        Returns the weight of the label of each node (NaN if the label has no weight, or is missing).
+        :param weights: the attribute weights
+        :return: the array of weights
+        """
+        label_weights = np.array(
+            [weights.get(label, np.nan) for label in self.labels] + [np.nan]
+        )
+        return label_weights[self.codes]  # -1 picks the trailing NaN
+
+    def marginalization_scores(self, weights: dict) -> np.ndarray:
+        """
+        Computes the marginalization scores of the nodes, in node order.
+        :param weights: the attribute weights
+        :return: the array of marginalization scores
+        """
+        same, degree = self.label_counts()
+        return marginalization_scores_from_counts(
+            same, degree, self.node_weights(weights)
+        )
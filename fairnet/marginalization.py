@@ -2,9 +2,14 @@ from collections import Counter
 
 import networkx as nx
 import numpy as np
+import scipy.sparse as sp
 
 __all__ = [
     "compute_weights",
+    "csr_adjacency",
+    "graph_to_csr",
+    "neighbor_label_counts",
+    "marginalization_scores_from_counts",
     "individual_marginalization_score",
     "compute_marginalization_scores",
     "network_marginalization_score",
@@ -27,6 +32,85 @@ def compute_weights(attrs: dict) -> dict:
     return weights
 
 
+def csr_adjacency(g: nx.Graph) -> tuple:
+    """
+    Converts the graph into a CSR adjacency matrix.
+    Row i of the adjacency matrix holds the neighbors of the i-th node of g.nodes(); multi-edges are collapsed
+    so that the row sum of a node equals the number of its distinct neighbors.
+    :param g: the graph object
+    :return: a tuple (nodes, adjacency)
+    """
+    nodes = list(g.nodes())
+    if len(nodes) > 0:
+        adj = nx.to_scipy_sparse_array(g, nodelist=nodes, weight=None, format="csr")
+        adj.data = np.ones(len(adj.data), dtype=np.int32)
+    else:
+        adj = sp.csr_array((0, 0), dtype=np.int32)
+    return nodes, adj
+
+
+def graph_to_csr(g: nx.Graph, attrs: dict) -> tuple:
+    """
+    Converts the graph into a CSR adjacency matrix (see 'csr_adjacency') and an integer-encoded label array.
+    :param g: the graph object
+    :param attrs: the node-to-attribute value dict
+    :return: a tuple (nodes, adjacency, codes, labels), where codes[i] is the index in labels of the attribute
+        value of nodes[i]
+    """
+    nodes, adj = csr_adjacency(g)
+
+    labels = []
+    lookup = dict()
+    codes = np.empty(len(nodes), dtype=np.int64)
+    for i, node in enumerate(nodes):
+        attr = attrs[node]
+        if attr not in lookup:
+            lookup[attr] = len(labels)
+            labels.append(attr)
+        codes[i] = lookup[attr]
+
+    return nodes, adj, codes, labels
+
+
+def neighbor_label_counts(adj, codes: np.ndarray, n_labels: int) -> tuple:
+    """
+    Computes, for every node, the number of neighbors sharing its label and its degree.
+    It performs one sparse matrix-vector product per label.
+    :param adj: the CSR adjacency matrix
+    :param codes: the integer-encoded labels of the nodes
+    :param n_labels: the number of distinct labels
+    :return: a tuple (same, degree) of integer arrays
+    """
+    same = np.zeros(len(codes), dtype=np.int64)
+    for label in range(n_labels):
+        mask = codes == label
+        counts = adj @ mask.astype(np.int32)
+        same[mask] = counts[mask]
+    degree = np.diff(adj.indptr).astype(np.int64)
+    return same, degree
+
+
+def marginalization_scores_from_counts(
+    same: np.ndarray, degree: np.ndarray, node_weights: np.ndarray
+) -> np.ndarray:
+    """
+    Computes the marginalization scores of the nodes from their neighborhood counts.
+    Array counterpart of 'individual_marginalization_score': nodes with less than three neighbors score 0,
+    nodes with no neighbor sharing their label (or whose label has no weight) score 1.
+    :param same: the number of neighbors sharing the label of each node
+    :param degree: the number of neighbors of each node
+    :param node_weights: the weight of the label of each node (NaN if the label has no weight)
+    :return: the array of marginalization scores
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        num = same * node_weights
+        den = num + (degree - same) * (1 - node_weights)
+        marg = (num / den - 0.5) * 2
+    marg[(same == 0) | (den == 0) | np.isnan(node_weights)] = 1
+    marg[degree <= 2] = 0
+    return marg
+
+
 def individual_marginalization_score(
     g: nx.Graph, node: int, attrs: dict, weights: dict
 ) -> float:
@@ -72,12 +156,12 @@ def compute_marginalization_scores(g: nx.Graph, attrs: dict, weights: dict) -> d
     :return: a dictionary containing the marginalization scores
     """
 
-    marg_dict = dict()
-
-    for node in g.nodes():
-        marg_dict[node] = individual_marginalization_score(g, node, attrs, weights)
+    nodes, adj, codes, labels = graph_to_csr(g, attrs)
+    same, degree = neighbor_label_counts(adj, codes, len(labels))
+    label_weights = np.array([weights.get(label, np.nan) for label in labels])
+    marg = marginalization_scores_from_counts(same, degree, label_weights[codes])
 
-    return marg_dict
+    return dict(zip(nodes, marg.tolist()))
 
 
 def network_marginalization_score(marg_dict):
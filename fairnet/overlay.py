@@ -0,0 +1,175 @@
+import networkx as nx
+import numpy as np
+
+__all__ = ["EdgeDelta", "OverlayGraph"]
+
+
+class EdgeDelta(object):
+    def __init__(self, added: list, removed: list, directed: bool):
+        """
+        Compact representation of the changes made to a graph: the added and the removed edges.
+
+        :param added: the list of (u, v) edges to add
+        :param removed: the list of (u, v) edges to remove
+        :param directed: whether the graph is directed
+        """
+        self.added = added
+        self.removed = removed
+        self.directed = directed
+
+    @classmethod
+    def from_toggled(cls, index, edges: list) -> "EdgeDelta":
+        """
+        Builds the delta of toggling the given edges: existing edges are removed, the other ones are added.
+        An edge toggled twice is left untouched.
+        :param index: the GraphIndex of the graph
+        :param edges: the list of toggled edges, as (u, v, ...) tuples
+        :return: the delta
+        """
+        toggled = dict()
+        for e in edges:
+            key = (e[0], e[1])
+            if not index.directed and key[::-1] in toggled:
+                key = key[::-1]
+            if key in toggled:
+                del toggled[key]
+            else:
+                toggled[key] = True
+
+        added, removed = [], []
+        for u, v in toggled:
+            if _has_base_edge(index, u, v):
+                removed.append((u, v))
+            else:
+                added.append((u, v))
+        return cls(added, removed, index.directed)
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed)
+
+    def apply(self, g: nx.Graph) -> nx.Graph:
+        """
+        Applies the delta to a copy of the graph.
+        :param g: the graph
+        :return: the modified copy
+        """
+        g = g.copy()
+        g.remove_edges_from(self.removed)
+        g.add_edges_from(self.added)
+        return g
+
+
+def _has_base_edge(index, u, v) -> bool:
+    adj = index.adj
+    i, j = index.node_index[u], index.node_index[v]
+    row = adj.indices[adj.indptr[i] : adj.indptr[i + 1]]
+    if adj.has_sorted_indices:
+        k = np.searchsorted(row, j)
+        return bool(k < len(row) and row[k] == j)
+    return bool(np.any(row == j))
+
+
+class OverlayGraph(object):
+    def __init__(self, index, delta: EdgeDelta):
+        """
+        Read-only view of a graph with an edge delta applied, without copying the graph: queries are answered
+        from the CSR adjacency of its GraphIndex, corrected by the delta. Degrees count distinct neighbors.
+
+        :param index: the GraphIndex of the base graph
+        :param delta: the edge delta
+        """
+        self.index = index
+        self.delta = delta
+        self._added = dict()  # node -> added neighbors
+        self._removed = dict()  # node -> removed neighbors
+        for edges, adj in [(delta.added, self._added), (delta.removed, self._removed)]:
+            for u, v in edges:
+                adj.setdefault(u, set()).add(v)
+                if not index.directed:
+                    adj.setdefault(v, set()).add(u)
+
+    def is_directed(self) -> bool:
+        return self.index.directed
+
+    def nodes(self) -> list:
+        return self.index.nodes
+
+    def __iter__(self):
+        return iter(self.index.nodes)
+
+    def __len__(self) -> int:
+        return len(self.index.nodes)
+
+    def __contains__(self, node) -> bool:
+        return node in self.index.node_index
+
+    def number_of_nodes(self) -> int:
+        return len(self.index.nodes)
+
+    def _base_neighbors(self, node) -> list:
+        adj = self.index.adj
+        i = self.index.node_index[node]
+        row = adj.indices[adj.indptr[i] : adj.indptr[i + 1]]
+        return [self.index.nodes[j] for j in row.tolist()]
+
+    def has_edge(self, u, v) -> bool:
+        if v in self._removed.get(u, ()):
+            return False
+        if v in self._added.get(u, ()):
+            return True
+        return _has_base_edge(self.index, u, v)
+
+    def neighbors(self, node):
+        """
+        Iterates over the (out-)neighbors of a node.
+        """
+        removed = self._removed.get(node, ())
+        for n in self._base_neighbors(node):
+            if n not in removed:
+                yield n
+        yield from self._added.get(node, ())
+
+    def degree(self, node) -> int:
+        """
+        Returns the number of (out-)neighbors of a node.
+        """
+        i = self.index.node_index[node]
+        return int(
+            self.index.degree[i]
+            - len(self._removed.get(node, ()))
+            + len(self._added.get(node, ()))
+        )
+
+    def edges(self):
+        """
+        Iterates over the edges, each undirected edge once.
+        """
+        seen = set()
+        for u in self.index.nodes:
+            for v in self.neighbors(u):
+                if not self.index.directed:
+                    if v in seen:
+                        continue
+                yield u, v
+            if not self.index.directed:
+                seen.add(u)
+
+    def number_of_edges(self) -> int:
+        n_base = len(self.index.adj.indices)
+        if not self.index.directed:  # self-loops appear once in the adjacency
+            loops = int(np.count_nonzero(self.index.adj.diagonal()))
+            n_base = (n_base + loops) // 2
+        return n_base - len(self.delta.removed) + len(self.delta.added)
+
+    def to_networkx(self) -> nx.Graph:
+        """
+        Materializes the view: the base graph is copied (or built from the adjacency, if the index has no
+        graph) and the delta is applied.
+        :return: the graph
+        """
+        if self.index.g is not None:
+            return self.delta.apply(self.index.g)
+        g = nx.DiGraph() if self.index.directed else nx.Graph()
+        g.add_nodes_from(self.index.nodes)
+        g.add_edges_from(self.edges())
+        return g
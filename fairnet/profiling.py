@@ -0,0 +1,178 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+__all__ = ["Profiler"]
+
+
+class Profiler(object):
+    def __init__(self, hook=None, memory: bool = True):
+        """
+        Per-phase instrumentation of a FairNet object: wall time, number of calls and peak allocations of each
+        phase (e.g., candidate generation, selection, variation, evaluation), overall and per GA generation.
+        Peak allocations are traced with tracemalloc, which slows the run down; they are measured from the
+        allocated memory at the start of the phase. Before Python 3.9, which cannot reset the peak alone, the
+        traces are cleared at the start and end of each phase.
+        It is used as a context manager, see 'FairNet.profile'.
+
+        :param hook: function called with a dict for every completed phase, with keys 'phase', 'seconds',
+            'peak_bytes' (None without memory tracing) and 'generation' (None outside the GA loop)
+        :param memory: whether to trace the peak allocations
+        """
+        self.hook = hook
+        self.memory = memory
+        self.phases = dict()  # name -> {'calls', 'seconds', 'peak_bytes'}
+        self.counters = dict()  # name -> count, e.g. fitness evaluations
+        self.generations = []  # per-generation records
+
+        self._stack = []  # open phases: [traced memory at start, peak above it so far]
+        self._generation = None  # record of the open generation
+        self._started = False  # whether tracemalloc was started by this profiler
+        self.seconds = None  # total wall time
+
+    def __enter__(self) -> "Profiler":
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self._start
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def _update(self) -> None:
+        # the open phases keep the peak reached so far, above their start
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self._stack:
+            entry[1] = max(entry[1], peak - entry[0])
+
+    def _reset(self) -> None:
+        current = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, "reset_peak"):  # Python >= 3.9
+            tracemalloc.reset_peak()
+            return
+        # clearing the traces resets the peak too, and the traced memory restarts from 0: the start of the
+        # open phases is shifted accordingly
+        tracemalloc.clear_traces()
+        for entry in self._stack:
+            entry[0] -= current
+
+    def _push(self) -> None:
+        if not self.memory:
+            return
+        if self._stack:
+            self._update()
+        self._reset()
+        self._stack.append([tracemalloc.get_traced_memory()[0], 0])
+
+    def _pop(self):
+        if not self.memory:
+            return None
+        self._update()
+        _, peak = self._stack.pop()
+        self._reset()
+        return peak
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Measures a phase. Phases may be nested, and the same phase may be entered many times.
+        :param name: the name of the phase
+        """
+        self._push()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = self._pop()
+            self._add(name, seconds, peak)
+
+    @contextmanager
+    def generation(self, gen: int):
+        """
+        Measures a GA generation: the phases entered meanwhile are also accounted to it.
+        :param gen: the generation number
+        """
+        self._generation = {"generation": gen, "phases": dict()}
+        self._push()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record, self._generation = self._generation, None
+            record["seconds"] = time.perf_counter() - start
+            record["peak_bytes"] = self._pop()
+            self.generations.append(record)
+            self._add("generation", record["seconds"], record["peak_bytes"], gen)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """
+        Increments a counter.
+        :param name: the name of the counter
+        :param n: the increment
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+        if self._generation is not None:
+            counters = self._generation.setdefault("counters", dict())
+            counters[name] = counters.get(name, 0) + n
+
+    def _add(self, name: str, seconds: float, peak, gen=None) -> None:
+        stats = self.phases.setdefault(
+            name, {"calls": 0, "seconds": 0.0, "peak_bytes": None}
+        )
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        if peak is not None:
+            stats["peak_bytes"] = max(stats["peak_bytes"] or 0, peak)
+        if self._generation is not None and name != "generation":
+            gen = self._generation["generation"]
+            self._generation["phases"][name] = (
+                self._generation["phases"].get(name, 0.0) + seconds
+            )
+        if self.hook is not None:
+            self.hook(
+                {
+                    "phase": name,
+                    "seconds": seconds,
+                    "peak_bytes": peak,
+                    "generation": gen,
+                }
+            )
+
+    def report(self) -> dict:
+        """
+        Returns the structured report.
+        :return: a dict with the total 'seconds', the 'phases' ({name: {'calls', 'seconds', 'peak_bytes'}}),
+            the 'counters' and the 'generations' (a list of {'generation', 'seconds', 'peak_bytes', 'phases',
+            'counters'}, where 'phases' maps the phase names to their seconds within the generation)
+        """
+        return {
+            "seconds": self.seconds,
+            "phases": {name: dict(stats) for name, stats in self.phases.items()},
+            "counters": dict(self.counters),
+            "generations": list(self.generations),
+        }
+
+
+class _NullProfiler(object):
+    """
+    Profiler doing nothing, used when profiling is off.
+    """
+
+    @contextmanager
+    def phase(self, name: str):
+        yield
+
+    @contextmanager
+    def generation(self, gen: int):
+        yield
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+
+NULL_PROFILER = _NullProfiler()
@@ -0,0 +1,77 @@
+import logging
+
+__all__ = ["LoggingProgress", "TqdmProgress"]
+
+# Progress callbacks are called with a dict whose 'event' key is one of:
+#   'candidates'  a batch of candidate edges was generated: 'stage' ('plausible_edges' or 'removable_edges'),
+#                 'done' and 'total' batches
+#   'start'       a solver starts: 'solver' ('ga', 'greedy', 'local_search' or 'missing_values'), 'fitness'
+#                 and 'candidates' (the number of candidate edges, or of missing values)
+#   'generation'  the logbook record of a GA generation ('gen', 'best', 'avg', ...), with 'total' generations
+#   'end'         a solver stopped: 'solver' and 'stop' (the reason, see the logbook)
+
+
+def notify(progress, event: str, **fields) -> None:
+    """
+    Calls the progress callback, if any.
+    :param progress: the callback, or None for silence
+    :param event: the event type
+    :param fields: the fields of the event
+    """
+    if progress is not None:
+        progress({"event": event, **fields})
+
+
+class LoggingProgress(object):
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        """
+        Progress callback writing the events to a logger, one line per event.
+
+        :param logger: the logger, by default the 'fairnet' one
+        :param level: the logging level of the events
+        """
+        self.logger = logger or logging.getLogger("fairnet")
+        self.level = level
+
+    def __call__(self, event: dict) -> None:
+        if not self.logger.isEnabledFor(self.level):
+            return
+        fields = " ".join(f"{k}={v}" for k, v in event.items() if k != "event")
+        self.logger.log(self.level, "%s %s", event["event"], fields)
+
+
+class TqdmProgress(object):
+    def __init__(self, **kwargs):
+        """
+        Progress callback drawing tqdm bars: one for each candidate generation stage and one for the GA
+        generations, with the best and average fitness as postfix.
+
+        :param kwargs: the keyword arguments of the bars
+        """
+        self.kwargs = kwargs
+        self.bars = dict()
+
+    def _bar(self, name: str, total: int):
+        if name not in self.bars:
+            from tqdm.auto import tqdm
+
+            self.bars[name] = tqdm(total=total, desc=name, **self.kwargs)
+        return self.bars[name]
+
+    def _close(self, name: str) -> None:
+        bar = self.bars.pop(name, None)
+        if bar is not None:
+            bar.close()
+
+    def __call__(self, event: dict) -> None:
+        if event["event"] == "candidates":
+            bar = self._bar(event["stage"], event["total"])
+            bar.update(event["done"] - bar.n)
+            if event["done"] >= event["total"]:
+                self._close(event["stage"])
+        elif event["event"] == "generation":
+            bar = self._bar("generations", event["total"])
+            bar.set_postfix(best=event["best"], avg=event["avg"], refresh=False)
+            bar.update(event["gen"] - bar.n)
+        elif event["event"] == "end":
+            self._close("generations")
@@ -0,0 +1,313 @@
+import heapq
+
+import numpy as np
+from deap import tools
+
+from .genetic import MarginalizationEvaluator
+from .genome import PackedGenome
+from .marginalization import marginalization_scores_from_counts
+
+__all__ = ["SOLVER_PARAMS", "greedy_solver", "local_search_solver"]
+
+SOLVER_PARAMS = {
+    "MAX_STEPS": None,  # maximum number of moves (None: until no move improves the fitness)
+    "MAX_PAIRS": 100000,  # maximum number of 2-flip moves tested by the local search
+    "INIT": "greedy",  # starting point of the local search, either 'greedy' or 'empty'
+}
+
+_EPS = 1e-12  # changes in |IMS| below this value are ties
+
+
+class _SolverState(object):
+    def __init__(self, evaluator: MarginalizationEvaluator):
+        """
+        Current solution of a solver: the toggled candidate edges and the per-node counts they lead to.
+        Candidates listed more than once are handled through their first occurrence.
+
+        :param evaluator: the evaluator of the fitted FairNet object
+        """
+        self.ev = evaluator
+        if evaluator.edge_ids is not None:
+            self.candidates = np.sort(evaluator.first)
+        else:
+            self.candidates = np.arange(len(evaluator.u))
+
+        self.same = evaluator.same.copy()
+        self.degree = evaluator.degree.copy()
+        self.abs_marg = evaluator.abs_marg.copy()
+        self.num_marg_nodes = evaluator.num_marg_nodes
+        self.total_marg = evaluator.total_marg
+        self.toggled = np.zeros(len(evaluator.u), dtype=bool)
+        self.budget = 0
+
+    def signs(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Returns the count deltas of toggling the given candidates: toggled candidates are restored.
+        """
+        return self.ev.sign[idx] * np.where(self.toggled[idx], -1, 1)
+
+    def keys(self, d_nodes, d_marg, d_budget) -> tuple:
+        """
+        Returns the changes in the objectives, in fitness order, with |IMS| ties rounded to 0.
+        :return: a tuple (first objective, budget, other objective) of arrays
+        """
+        d_marg = np.where(np.abs(d_marg) < _EPS, 0.0, d_marg) / self.ev.n_nodes
+        if self.ev.fitness == "nodes":
+            return d_nodes, d_budget, d_marg
+        return d_marg, d_budget, d_nodes
+
+    def flip_keys(self, idx: np.ndarray) -> tuple:
+        """
+        Returns the changes in the objectives caused by toggling each of the given candidates alone.
+        """
+        sign = self.signs(idx)
+        d_nodes, d_marg = self.ev.single_flip_gains(idx, self.same, self.degree, sign)
+        return self.keys(d_nodes, d_marg, np.where(self.toggled[idx], -1, 1))
+
+    def _move(self, idx: np.ndarray) -> tuple:
+        """
+        Computes the counts of the nodes affected by toggling the given candidates together.
+        :return: a tuple (affected, same, degree, |IMS|)
+        """
+        affected, same, degree = self.ev.delta(
+            idx, self.same, self.degree, self.signs(idx)
+        )
+        new_abs = np.abs(
+            marginalization_scores_from_counts(
+                same, degree, self.ev.node_weights[affected]
+            )
+        )
+        return affected, same, degree, new_abs
+
+    def pair_keys(self, pairs: np.ndarray) -> tuple:
+        """
+        Returns the changes in the objectives caused by toggling each pair of candidates together.
+        Pairs are evaluated at once, by grouping the count deltas by (pair, node).
+        :param pairs: the (pairs x 2) array of candidate indexes
+        """
+        idx = pairs.ravel()
+        positions, u, d_same, d_degree = self.ev.endpoint_deltas(idx, self.signs(idx))
+        owner = positions // 2
+
+        keys, inverse = np.unique(owner * self.ev.n_nodes + u, return_inverse=True)
+        pair, node = np.divmod(keys, self.ev.n_nodes)
+        new_abs = np.abs(
+            marginalization_scores_from_counts(
+                self.same[node] + np.bincount(inverse, weights=d_same).astype(np.int64),
+                self.degree[node]
+                + np.bincount(inverse, weights=d_degree).astype(np.int64),
+                self.ev.node_weights[node],
+            )
+        )
+        old_abs = self.abs_marg[node]
+        crossed = (new_abs > self.ev.thresh).astype(np.int64) - (
+            old_abs > self.ev.thresh
+        ).astype(np.int64)
+        d_nodes = np.bincount(pair, weights=crossed, minlength=len(pairs))
+        d_marg = np.bincount(pair, weights=new_abs - old_abs, minlength=len(pairs))
+        d_budget = np.where(self.toggled[pairs], -1, 1).sum(axis=1)
+        return self.keys(d_nodes.astype(np.int64), d_marg, d_budget)
+
+    def apply(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Toggles the given candidates.
+        :return: the affected nodes
+        """
+        affected, same, degree, new_abs = self._move(idx)
+        old_abs = self.abs_marg[affected]
+        self.num_marg_nodes += np.count_nonzero(
+            new_abs > self.ev.thresh
+        ) - np.count_nonzero(old_abs > self.ev.thresh)
+        self.total_marg += new_abs.sum() - old_abs.sum()
+        self.same[affected], self.degree[affected] = same, degree
+        self.abs_marg[affected] = new_abs
+        self.budget += int(np.where(self.toggled[idx], -1, 1).sum())
+        self.toggled[idx] = ~self.toggled[idx]
+        return affected
+
+    def fitness(self) -> tuple:
+        return self.ev._fitness(
+            self.num_marg_nodes, self.budget, self.total_marg / self.ev.n_nodes
+        )
+
+    def incidence(self) -> tuple:
+        """
+        Returns the CSR index of the candidates whose gains depend on each node, i.e., their endpoints (their
+        source, if the graph is directed).
+        :return: a tuple (indptr, positions in self.candidates)
+        """
+        ends = [self.ev.u[self.candidates]]
+        pos = [np.arange(len(self.candidates))]
+        if not self.ev.directed:
+            ends.append(self.ev.v[self.candidates])
+            pos.append(np.arange(len(self.candidates)))
+        ends, pos = np.concatenate(ends), np.concatenate(pos)
+        order = np.argsort(ends, kind="stable")
+        indptr = np.searchsorted(ends[order], np.arange(self.ev.n_nodes + 1))
+        return indptr, pos[order]
+
+
+def _improves(key) -> bool:
+    """
+    Tells whether a change in the objectives improves the fitness, which is minimized lexicographically.
+    """
+    for k in key:
+        if k != 0:
+            return k < 0
+    return False
+
+
+def _record(logbook, step, state, **extra) -> None:
+    fitness = state.fitness()
+    logbook.record(
+        gen=step,
+        best=fitness[0],
+        avg=fitness[0],
+        other=fitness[2],
+        budget=fitness[1],
+        **extra,
+    )
+
+
+def _result(state, logbook, reason) -> tuple:
+    logbook[-1]["stop"] = reason
+    return logbook, PackedGenome.from_genes(state.toggled)
+
+
+def _greedy(state: _SolverState, logbook, max_steps) -> str:
+    """
+    Greedy loop: repeatedly toggles the untoggled candidate with the best gain (first objective, then the other
+    one), until none improves the fitness.
+    Gains live in a priority queue; when a candidate is toggled, the gains of the candidates sharing its
+    endpoints are recomputed and pushed again, and the outdated entries are skipped when popped.
+    :return: the reason to stop ('converged' or 'steps')
+    """
+    candidates = state.candidates
+    indptr, incident = state.incidence()
+    version = np.zeros(state.ev.n_nodes, dtype=np.int64)
+    u, v = state.ev.u, state.ev.v
+
+    def stamp(pos):
+        i = candidates[pos]
+        return version[u[i]] if state.ev.directed else version[u[i]] + version[v[i]]
+
+    def push(heap, pos):
+        pos = pos[~state.toggled[candidates[pos]]]
+        first, _, other = state.flip_keys(candidates[pos])
+        for p, k0, k1, s in zip(pos, first.tolist(), other.tolist(), stamp(pos)):
+            if k0 < 0:  # toggling costs budget, the first objective must improve
+                heap.append((k0, k1, int(p), int(s)))
+
+    heap = []
+    push(heap, np.arange(len(candidates)))
+    heapq.heapify(heap)
+
+    step = 0
+    while heap:
+        if max_steps is not None and step >= max_steps:
+            return "steps"
+        _, _, pos, s = heapq.heappop(heap)
+        if state.toggled[candidates[pos]] or s != stamp(pos):
+            continue  # outdated entry
+        affected = state.apply(candidates[[pos]])
+        step += 1
+        _record(logbook, step, state)
+
+        version[affected] += 1
+        touched = np.unique(
+            np.concatenate([incident[indptr[n] : indptr[n + 1]] for n in affected])
+        )
+        new = []
+        push(new, touched)
+        for entry in new:
+            heapq.heappush(heap, entry)
+    return "converged"
+
+
+def greedy_solver(fn: object, params: dict = None) -> tuple:
+    """
+    Reduces marginalization by greedily toggling the candidate edges with the best marginal fitness gain.
+    :param fn: the fitted FairNet object, with its candidate edges
+    :param params: the solver parameters, see SOLVER_PARAMS
+    :return: a tuple (logbook, solution genome); the logbook holds one record per toggled edge
+    """
+    params = {**SOLVER_PARAMS, **(params or {})}
+    state = _SolverState(MarginalizationEvaluator(fn))
+
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "best", "avg", "other", "budget"]
+    _record(logbook, 0, state)
+    reason = _greedy(state, logbook, params["MAX_STEPS"])
+    return _result(state, logbook, reason)
+
+
+def _pairs(state: _SolverState, indptr, incident, max_pairs: int) -> np.ndarray:
+    """
+    Returns the 2-flip moves worth testing, i.e., the pairs of candidates sharing an endpoint: the gains of
+    the other pairs add up, so they cannot improve the fitness when no 1-flip move does.
+    :return: the (pairs x 2) array of candidate indexes, at most max_pairs of them
+    """
+    pairs = [np.zeros((0, 2), dtype=np.int64)]
+    left = max_pairs
+    for node in range(len(indptr) - 1):
+        if left <= 0:
+            break
+        pos = incident[indptr[node] : indptr[node + 1]]
+        pos = pos[: int(np.sqrt(2 * left)) + 2]  # enough for the pairs left
+        a, b = np.triu_indices(len(pos), 1)
+        found = np.stack([pos[a], pos[b]], axis=1)
+        found = found[found[:, 0] != found[:, 1]][:left]  # self-loops
+        pairs.append(found)
+        left -= len(found)
+    return state.candidates[np.concatenate(pairs)]
+
+
+def local_search_solver(fn: object, params: dict = None) -> tuple:
+    """
+    Reduces marginalization by hill climbing over the candidate edges, from the greedy solution or from the
+    original graph. At each step, it applies the best 1-flip move (toggling or restoring one edge) if it
+    improves the fitness, and the best 2-flip move otherwise; it stops at a local optimum.
+    :param fn: the fitted FairNet object, with its candidate edges
+    :param params: the solver parameters, see SOLVER_PARAMS
+    :return: a tuple (logbook, solution genome); the logbook holds one record per move
+    """
+    params = {**SOLVER_PARAMS, **(params or {})}
+    if params["INIT"] not in ("greedy", "empty"):
+        raise ValueError("'INIT' must be either 'greedy' or 'empty'")
+    state = _SolverState(MarginalizationEvaluator(fn))
+    candidates = state.candidates
+    indptr, incident = state.incidence()
+    pairs = _pairs(state, indptr, incident, params["MAX_PAIRS"])
+
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "best", "avg", "other", "budget", "move"]
+    _record(logbook, 0, state, move="init")
+    if params["INIT"] == "greedy":
+        _greedy(state, logbook, params["MAX_STEPS"])
+        for record in logbook[1:]:
+            record["move"] = "greedy"
+
+    step = len(logbook) - 1
+    while True:
+        if params["MAX_STEPS"] is not None and step >= params["MAX_STEPS"]:
+            return _result(state, logbook, "steps")
+        step += 1
+        if len(candidates) == 0:
+            break
+
+        keys = state.flip_keys(candidates)
+        best = np.lexsort(keys[::-1])[0]
+        if _improves(tuple(k[best] for k in keys)):
+            state.apply(candidates[[best]])
+            _record(logbook, step, state, move="1-flip")
+            continue
+
+        if len(pairs) == 0:
+            break
+        keys = state.pair_keys(pairs)
+        best = np.lexsort(keys[::-1])[0]
+        if not _improves(tuple(k[best] for k in keys)):
+            break
+        state.apply(pairs[best])
+        _record(logbook, step, state, move="2-flip")
+    return _result(state, logbook, "converged")
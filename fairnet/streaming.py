@@ -0,0 +1,274 @@
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from .marginalization import marginalization_scores_from_counts
+
+__all__ = ["ThresholdEvent", "MarginalizationTracker"]
+
+ThresholdEvent = namedtuple("ThresholdEvent", ["node", "old", "new", "marginalized"])
+ThresholdEvent.__doc__ = """
+A node crossed the marginalization threshold: 'old' and 'new' are its scores (new is None if the node was
+removed), 'marginalized' tells whether it is marginalized now.
+"""
+
+
+class MarginalizationTracker(object):
+    def __init__(self, fn: object):
+        """
+        Incremental maintenance of the marginalization scores of a fitted FairNet object under graph updates.
+        It keeps the per-node same-label counts and degrees, and the label sizes the weights depend on. An edge
+        update rescores its endpoints only; an attribute update rescores the node, the nodes whose neighborhood
+        contains it, and the nodes sharing one of the labels whose weight changed. Nodes are grouped by
+        (label, same-label neighbors, degree), so that the nodes of a label are rescored once per group; adding
+        or removing a labeled node changes every weight, hence every group.
+        fn.g, fn.attrs, fn.weights, fn.marg_dict and fn.disc_nodes are updated in place.
+
+        :param fn: the fitted FairNet object, owning its graph
+        """
+        self.fn = fn
+        index = fn.index
+        same, degree = index.label_counts()
+        self.same = dict(zip(index.nodes, same.tolist()))
+        self.degree = dict(zip(index.nodes, degree.tolist()))
+        self.sizes = Counter(fn.attrs.values())
+
+        self.groups = dict()  # (label, same, degree) -> nodes
+        self.label_groups = dict()  # label -> keys of its groups
+        for node in index.nodes:
+            self._join(node)
+
+    # groups
+
+    def _key(self, node) -> tuple:
+        return self.fn.attrs.get(node), self.same[node], self.degree[node]
+
+    def _join(self, node) -> None:
+        key = self._key(node)
+        if key not in self.groups:
+            self.groups[key] = set()
+            self.label_groups.setdefault(key[0], set()).add(key)
+        self.groups[key].add(node)
+
+    def _leave(self, node) -> None:
+        key = self._key(node)
+        group = self.groups[key]
+        group.discard(node)
+        if not group:
+            del self.groups[key]
+            self.label_groups[key[0]].discard(key)
+
+    # scores
+
+    def _weight(self, label) -> float:
+        if label is None or label not in self.fn.weights:
+            return np.nan
+        return self.fn.weights[label]
+
+    def _update_weights(self) -> None:
+        n = sum(self.sizes.values())
+        weights = {
+            label: 1 - (size - 1) / (n - 1) if n > 1 else 1.0
+            for label, size in self.sizes.items()
+        }
+        self.fn.weights.clear()
+        self.fn.weights.update(weights)
+
+    def _set_score(self, node, score: float, events: list) -> None:
+        old = self.fn.marg_dict.get(node, 0.0)
+        self.fn.marg_dict[node] = score
+        was, now = abs(old) > self.fn.thresh, abs(score) > self.fn.thresh
+        if was != now:
+            if now:
+                self.fn._disc[node] = None
+            else:
+                del self.fn._disc[node]
+            events.append(ThresholdEvent(node, old, score, now))
+
+    def _rescore_nodes(self, nodes, events: list) -> None:
+        nodes = list(nodes)
+        scores = marginalization_scores_from_counts(
+            np.array([self.same[n] for n in nodes], dtype=np.int64),
+            np.array([self.degree[n] for n in nodes], dtype=np.int64),
+            np.array([self._weight(self.fn.attrs.get(n)) for n in nodes]),
+        )
+        for node, score in zip(nodes, scores.tolist()):
+            self._set_score(node, score, events)
+
+    def _rescore_labels(self, labels, events: list) -> None:
+        """
+        Rescores the nodes of the given labels after a weight change, once per group.
+        """
+        keys = [key for label in labels for key in self.label_groups.get(label, ())]
+        if not keys:
+            return
+        scores = marginalization_scores_from_counts(
+            np.array([key[1] for key in keys], dtype=np.int64),
+            np.array([key[2] for key in keys], dtype=np.int64),
+            np.array([self._weight(key[0]) for key in keys]),
+        )
+        for key, score in zip(keys, scores.tolist()):
+            for node in self.groups[key]:
+                if self.fn.marg_dict[node] != score:
+                    self._set_score(node, score, events)
+
+    def _change_counts(self, changes: dict, events: list) -> None:
+        """
+        Applies count deltas {node: (d_same, d_degree)} and rescores the nodes.
+        """
+        for node, (d_same, d_degree) in changes.items():
+            self._leave(node)
+            self.same[node] += d_same
+            self.degree[node] += d_degree
+            self._join(node)
+        self._rescore_nodes(changes, events)
+
+    def _neighborhood_of(self, node) -> list:
+        """
+        Returns the nodes whose neighborhood contains the node.
+        """
+        g = self.fn.g
+        return list(g.predecessors(node) if g.is_directed() else g.neighbors(node))
+
+    def net_events(self, events: list) -> list:
+        """
+        Collapses the events of an update, so that each node is reported once, if its marginalization changed
+        from before to after the update.
+        :param events: the list of ThresholdEvent, in order
+        :return: the list of ThresholdEvent
+        """
+        first, last = dict(), dict()
+        for event in events:
+            first.setdefault(event.node, event)
+            last[event.node] = event
+        net = []
+        for node, event in first.items():
+            new = last[node].new
+            was = abs(event.old) > self.fn.thresh
+            now = new is not None and abs(new) > self.fn.thresh
+            if was != now:
+                net.append(ThresholdEvent(node, event.old, new, now))
+        return net
+
+    # updates
+
+    def _edge_changes(self, u, v, sign: int) -> dict:
+        attrs = self.fn.attrs
+        match = int(attrs.get(u) is not None and attrs.get(u) == attrs.get(v))
+        changes = {u: (sign * match, sign)}
+        if not self.fn.g.is_directed() and u != v:
+            changes[v] = (sign * match, sign)
+        return changes
+
+    def add_edge(self, u, v) -> list:
+        events = []
+        for node in (u, v):
+            if node not in self.fn.g:
+                events.extend(self.add_node(node))
+        if self.fn.g.has_edge(u, v):
+            return events
+        self.fn.g.add_edge(u, v)
+        self._change_counts(self._edge_changes(u, v, 1), events)
+        return events
+
+    def remove_edge(self, u, v) -> list:
+        self.fn.g.remove_edge(u, v)  # raises if the edge does not exist
+        events = []
+        self._change_counts(self._edge_changes(u, v, -1), events)
+        return events
+
+    def add_node(self, node, attr=None) -> list:
+        if node in self.fn.g:
+            return self.set_attribute(node, attr) if attr is not None else []
+        self.fn.g.add_node(node)
+        self.same[node], self.degree[node] = 0, 0
+        self.fn.marg_dict[node] = 0.0
+        events = []
+        if attr is None:
+            self.fn.missing.append(node)
+            self._join(node)
+            return events
+        self.fn.attrs[node] = attr
+        self._join(node)
+        self.sizes[attr] += 1
+        self._update_weights()  # the number of labeled nodes changed
+        self._rescore_labels(list(self.label_groups), events)
+        return events
+
+    def remove_node(self, node) -> list:
+        g = self.fn.g
+        old = self.fn.marg_dict[node]
+        was = node in self.fn._disc
+        events = []
+        for n in list(g.successors(node) if g.is_directed() else g.neighbors(node)):
+            events.extend(self.remove_edge(node, n))
+        if g.is_directed():
+            for n in list(g.predecessors(node)):
+                events.extend(self.remove_edge(n, node))
+
+        # the node leaves, whatever happened to its score meanwhile
+        events = [e for e in events if e.node != node]
+        if was:
+            events.append(ThresholdEvent(node, old, None, False))
+        self.fn._disc.pop(node, None)
+        self._leave(node)
+        g.remove_node(node)
+        del self.fn.marg_dict[node], self.same[node], self.degree[node]
+
+        attr = self.fn.attrs.pop(node, None)
+        if attr is None:
+            self.fn.missing.remove(node)
+            return events
+        self.sizes[attr] -= 1
+        if self.sizes[attr] == 0:
+            del self.sizes[attr]
+        self._update_weights()  # the number of labeled nodes changed
+        self._rescore_labels(list(self.label_groups), events)
+        return events
+
+    def set_attribute(self, node, attr) -> list:
+        if attr is None:
+            raise ValueError("The attribute value must not be None")
+        if node not in self.fn.g:
+            return self.add_node(node, attr)
+        old_attr = self.fn.attrs.get(node)
+        if old_attr == attr:
+            return []
+        events = []
+
+        self.sizes[attr] += 1
+        if old_attr is not None:
+            self.sizes[old_attr] -= 1
+            if self.sizes[old_attr] == 0:
+                del self.sizes[old_attr]
+        self._update_weights()
+
+        # the node itself
+        g = self.fn.g
+        neighbors = list(g.successors(node) if g.is_directed() else g.neighbors(node))
+        self._leave(node)
+        self.fn.attrs[node] = attr
+        if old_attr is None:
+            self.fn.missing.remove(node)
+        self.same[node] = sum(1 for n in neighbors if self.fn.attrs.get(n) == attr)
+        self._join(node)
+
+        # the nodes whose neighborhood contains it
+        changes = dict()
+        for n in self._neighborhood_of(node):
+            if n == node:
+                continue
+            label = self.fn.attrs.get(n)
+            d_same = int(label is not None and label == attr) - int(
+                label is not None and label == old_attr
+            )
+            if d_same != 0:
+                changes[n] = (d_same, 0)
+        self._change_counts(changes, events)
+
+        # the nodes whose weight changed
+        if old_attr is None:  # the number of labeled nodes changed
+            self._rescore_labels(list(self.label_groups), events)
+        else:
+            self._rescore_labels([old_attr, attr], events)
+        return events
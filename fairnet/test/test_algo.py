@@ -1,7 +1,27 @@
 from unittest import TestCase
 import networkx as nx
 import random
+import numpy as np
 from fairnet.classes import FairNet
+from fairnet.index import GraphIndex
+from fairnet.overlay import EdgeDelta
+from fairnet.edges import get_plausible_edges, get_removable_edges
+from fairnet.genetic import (
+    FitnessCache,
+    MarginalizationEvaluator,
+    MissingValuesEvaluator,
+    genome_key,
+    greedy_genomes,
+    mutate_missing,
+    random_individual_missing,
+    weighted_genomes,
+)
+from fairnet.genome import PackedGenome, cx_two_point, mut_flip_bit
+from fairnet.marginalization import (
+    compute_weights,
+    compute_marginalization_scores,
+    individual_marginalization_score,
+)
 
 
 def get_data(all_attrs=True):
@@ -22,6 +42,38 @@ def get_fitted(all_attrs=True):
     return fn
 
 
+def plausible_reference(fn):
+    plausible = nx.Graph()
+    for node in fn.disc_nodes:
+        neighs = set(fn.g.neighbors(node))
+        neighs2 = set(nx.ego_graph(fn.g, node, center=False, radius=2).nodes())
+        for n in neighs2.difference(neighs):
+            weight = len(neighs.intersection(set(fn.g.neighbors(n))))
+            if not fn.strategy.endswith("g"):
+                plausible.add_edge(node, n, weight=weight)
+            elif fn.is_marginalized(n):
+                if fn.marg_dict[node] > 0 and fn.marg_dict[n] > 0:
+                    if fn.attrs[n] != fn.attrs[node]:
+                        plausible.add_edge(node, n, weight=weight)
+                elif fn.marg_dict[node] < 0 and fn.marg_dict[n] < 0:
+                    if fn.attrs[n] == fn.attrs[node]:
+                        plausible.add_edge(node, n, weight=weight)
+    return {(frozenset(e[:2]), e[2]["weight"]) for e in plausible.edges(data=True)}
+
+
+def removable_reference(fn):
+    removable = dict()
+    for u, v in fn.g.edges():
+        weight = len(set(fn.g.neighbors(u)).intersection(set(fn.g.neighbors(v))))
+        if fn.strategy.endswith("g"):
+            if fn.is_marginalized(u) and fn.is_marginalized(v):
+                if fn.attrs[u] == fn.attrs[v] or fn.marg_dict[u] < 0:
+                    removable[frozenset((u, v))] = weight
+        elif fn.is_marginalized(u) or fn.is_marginalized(v):
+            removable[frozenset((u, v))] = weight
+    return removable
+
+
 class FairNetTest(TestCase):
 
     def test_fit(self):
@@ -38,6 +90,425 @@ class FairNetTest(TestCase):
             self.assertEqual(len(fn.weights), 2)
             self.assertEqual(len(fn.marg_dict), len(attrs))
 
+    def test_graph_index(self):
+        g, attrs = get_data()
+        index = GraphIndex(g, attrs)
+
+        edges = list(g.edges())
+        rows = [index.node_index[u] for u, _ in edges]
+        cols = [index.node_index[v] for _, v in edges]
+
+        def computed(i):
+            return int(np.unpackbits(i._triangles.computed).sum())
+
+        counts = index.edge_triangles(rows[:10], cols[:10])
+        self.assertEqual(computed(index), 10)  # only the requested edges
+        # cached per edge, in both orientations, and shared with the other indexes of the graph
+        other = index.with_attrs({n: n % 3 for n in g.nodes()})
+        counts = other.edge_triangles(cols, rows)
+        self.assertEqual(computed(index), len(edges))
+        for (u, v), count in zip(edges, counts):
+            self.assertEqual(count, len(list(nx.common_neighbors(g, u, v))))
+        self.assertEqual(index.edge_triangles(rows, cols).tolist(), counts.tolist())
+        # pairs that are not edges are counted, not cached
+        self.assertEqual(index.edge_triangles([0], [9]).tolist(), [1])
+        self.assertEqual(computed(index), len(edges))
+        with self.assertRaises(ValueError):
+            FairNet(GraphIndex(g))  # no attribute values
+
+        fns = [FairNet(index).fit(0.3), FairNet(index).fit(0.5)]
+        for fn in fns:
+            self.assertIs(fn.g, g)  # not copied
+            self.assertIs(fn.index.adj, index.adj)
+        reference = FairNet(g, attrs).fit(0.3)
+        self.assertEqual(fns[0].marg_dict, reference.marg_dict)
+        self.assertEqual(fns[0].disc_nodes, reference.disc_nodes)
+
+    def test_graph_index_on_disk(self):
+        import tempfile
+
+        g, attrs = get_data()
+        del attrs[0]  # missing value
+        with tempfile.TemporaryDirectory() as path:
+            GraphIndex(g, attrs).save(path)
+            index = GraphIndex.load(path)
+            self.assertIsNone(index.g)
+            self.assertIsInstance(index.codes, np.memmap)
+            self.assertEqual(index.nodes, list(g.nodes()))
+            self.assertEqual(index.attrs, attrs)
+
+            attrs[0] = "Mr. Hi"
+            fn = FairNet(index, attrs).fit(0.3)
+            reference = FairNet(g, attrs).fit(0.3)
+            self.assertEqual(fn.marg_dict, reference.marg_dict)
+            for f in [fn, reference]:
+                f.strategy, f.to_add, f.to_remove = "bl", 1.0, 1.0
+            self.assertEqual(get_plausible_edges(fn), get_plausible_edges(reference))
+            self.assertEqual(get_removable_edges(fn), get_removable_edges(reference))
+            self.assertIsInstance(index._triangles.counts, np.memmap)
+            n_computed = int(np.unpackbits(index._triangles.computed).sum())
+            self.assertGreater(n_computed, 0)
+            del index, fn  # release the memory maps
+
+            # the counts are written back to the directory
+            index = GraphIndex.load(path, mmap=False)
+            counts, computed = index._triangles.arrays()
+            self.assertEqual(int(np.unpackbits(computed).sum()), n_computed)
+            del index, counts, computed
+
+        # tuple and string node ids
+        grid = nx.grid_2d_graph(4, 4)
+        for h in [grid, nx.relabel_nodes(grid, {n: f"{n[0]}-{n[1]}" for n in grid})]:
+            h_attrs = {n: i % 2 for i, n in enumerate(h.nodes())}
+            with tempfile.TemporaryDirectory() as path:
+                GraphIndex(h, h_attrs).save(path)
+                index = GraphIndex.load(path)
+                self.assertEqual(index.nodes, list(h.nodes()))
+                self.assertEqual(index.attrs, h_attrs)
+                self.assertEqual(
+                    FairNet(index).fit(0.3).marg_dict,
+                    FairNet(h, h_attrs).fit(0.3).marg_dict,
+                )
+                del index
+
+    def test_streaming_updates(self):
+        rng = random.Random(7)
+        for directed in [False, True]:
+            g, attrs = get_data()
+            if directed:
+                g = nx.gnp_random_graph(40, 0.15, seed=3, directed=True)
+                attrs = {n: n % 3 for n in g.nodes()}
+            fn = FairNet(GraphIndex(g, attrs)).fit(0.3)
+            n_edges = g.number_of_edges()
+
+            for step in range(60):
+                nodes = list(fn.g.nodes())
+                before = set(fn.disc_nodes)
+                op = rng.choice(["add", "remove", "attr", "node", "drop"])
+                if op == "add":
+                    events = fn.add_edge(rng.choice(nodes), rng.choice(nodes))
+                elif op == "remove":
+                    events = fn.remove_edge(*rng.choice(list(fn.g.edges())))
+                elif op == "attr":
+                    events = fn.set_attribute(rng.choice(nodes), rng.choice([0, 1, 2]))
+                elif op == "node":
+                    events = fn.add_node(f"new{step}", rng.choice([0, 1, None]))
+                    fn.add_edge(f"new{step}", rng.choice(nodes))
+                    events = None
+                else:
+                    events = fn.remove_node(rng.choice(nodes))
+
+                reference = FairNet(fn.g, fn.attrs).fit(0.3)
+                self.assertEqual(fn.weights, reference.weights)
+                self.assertEqual(set(fn.marg_dict), set(reference.marg_dict))
+                for node, score in reference.marg_dict.items():
+                    self.assertAlmostEqual(fn.marg_dict[node], score)
+                self.assertEqual(set(fn.disc_nodes), set(reference.disc_nodes))
+                if events is not None:
+                    became = {e.node for e in events if e.marginalized}
+                    left = {e.node for e in events if not e.marginalized}
+                    self.assertEqual(became, set(fn.disc_nodes) - before)
+                    self.assertEqual(left, before - set(fn.disc_nodes))
+
+            self.assertEqual(
+                g.number_of_edges(), n_edges
+            )  # the indexed graph is untouched
+            fn.fit(0.3)  # rebuilds the index
+            self.assertEqual(len(fn.index), len(fn.g))
+
+    def test_updates_after_run(self):
+        import io
+        from contextlib import redirect_stdout
+        from unittest import mock
+
+        fn = get_fitted()
+        for i in range(34):
+            fn.add_node(f"new{i}", "Mr. Hi")
+        self.assertEqual(len(fn.index), 34)  # not refreshed yet
+        out = io.StringIO()
+        with redirect_stdout(out), mock.patch(
+            "fairnet.classes.plot_marginalization_scores"
+        ), mock.patch("fairnet.classes.plot_marginalization_scores_by_attr"):
+            n_disc, _ = fn.marginalization_info()
+        share = round(n_disc * 100 / fn.g.number_of_nodes(), 2)
+        self.assertIn(f"({share}%)", out.getvalue())
+
+        # the solution of a run refers to the graph it was computed on
+        fn = get_fitted()
+        fn.run(
+            fitness="marg",
+            strategy="bl",
+            to_add=1.0,
+            to_remove=1.0,
+            solver="greedy",
+            display=False,
+        )
+        fn.add_edge(0, 33)
+        with self.assertRaises(ValueError):
+            fn.get_fair_graph()
+        with self.assertRaises(ValueError):
+            fn.get_fair_view()
+        fn.candidates = []
+        fn.run(
+            fitness="marg",
+            strategy="bl",
+            to_add=1.0,
+            to_remove=1.0,
+            solver="greedy",
+            display=False,
+        )
+        self.assertEqual(
+            fn.get_fair_view().number_of_edges(), fn.get_fair_graph().number_of_edges()
+        )
+
+    def test_marginalization_scores(self):
+        g, attrs = get_data()
+        g.add_edge(0, 0)  # self-loop
+        g.add_node(34)  # isolated node
+        attrs[34] = "Officer"
+        g.add_edges_from([(35, 36), (35, 37), (35, 38)])  # no neighbor shares the label
+        attrs.update({35: "Mr. Hi", 36: "Officer", 37: "Officer", 38: "Officer"})
+
+        weights = compute_weights(attrs)
+        marg_dict = compute_marginalization_scores(g, attrs, weights)
+        for node in g.nodes():
+            self.assertEqual(
+                marg_dict[node],
+                individual_marginalization_score(g, node, attrs, weights),
+            )
+
+        # a single label has zero weight
+        attrs = {n: "same" for n in g.nodes()}
+        weights = compute_weights(attrs)
+        marg_dict = compute_marginalization_scores(g, attrs, weights)
+        for node in g.nodes():
+            self.assertEqual(
+                marg_dict[node],
+                individual_marginalization_score(g, node, attrs, weights),
+            )
+
+    def test_plausible_edges(self):
+        for directed in [False, True]:
+            for strategy in ["al", "ag"]:
+                g, attrs = get_data()
+                if directed:
+                    g = nx.gnp_random_graph(60, 0.1, seed=42, directed=True)
+                    attrs = {n: n % 3 for n in g.nodes()}
+                fn = FairNet(g, attrs).fit(0.1)
+                fn.strategy, fn.to_add = strategy, 1.0
+
+                edges = get_plausible_edges(fn, batch_size=7)
+                self.assertEqual(
+                    {(frozenset(e[:2]), e[2]["weight"]) for e in edges},
+                    plausible_reference(fn),
+                )
+                self.assertEqual(len(edges), len(plausible_reference(fn)))
+                weights = [e[2]["weight"] for e in edges]
+                self.assertEqual(weights, sorted(weights))
+
+    def test_removable_edges(self):
+        g, attrs = get_data()
+        g.add_edge(0, 0)  # self-loop
+        for strategy in ["rl", "rg"]:
+            fn = FairNet(g, attrs).fit(0.1)
+            fn.strategy, fn.to_remove = strategy, 1.0
+
+            edges = get_removable_edges(fn, batch_size=4)
+            reference = removable_reference(fn)
+            self.assertEqual({frozenset(e) for e in edges}, set(reference))
+            self.assertEqual(len(edges), len(reference))
+            weights = [reference[frozenset(e)] for e in edges]
+            self.assertEqual(weights, sorted(weights))
+
+    def test_streaming_selection(self):
+        fn = get_fitted()
+        for strategy in ["bl", "bg"]:
+            for fraction in [0.0, 0.1, 0.5, 1.0]:
+                fn.strategy, fn.to_add, fn.to_remove = strategy, fraction, fraction
+                self.assertEqual(
+                    get_plausible_edges(fn, batch_size=3, streaming=True),
+                    get_plausible_edges(fn, batch_size=3),
+                )
+                self.assertEqual(
+                    get_removable_edges(fn, batch_size=5, streaming=True),
+                    get_removable_edges(fn, batch_size=5),
+                )
+
+        g = nx.gnp_random_graph(40, 0.15, seed=3, directed=True)
+        directed = FairNet(g, {n: n % 3 for n in g.nodes()}).fit(0.3)
+        directed.strategy, directed.to_add, directed.to_remove = "bl", 0.3, 0.3
+        self.assertEqual(
+            get_plausible_edges(directed, batch_size=3, streaming=True),
+            get_plausible_edges(directed, batch_size=3),
+        )
+        self.assertEqual(
+            get_removable_edges(directed, batch_size=5, streaming=True),
+            get_removable_edges(directed, batch_size=5),
+        )
+
+        # the counting pass computes no weights and reports no progress
+        events = []
+        fn.progress = events.append
+        get_plausible_edges(fn, batch_size=3, streaming=True)
+        self.assertEqual(len(events), events[-1]["total"])
+        events.clear()
+        get_removable_edges(fn, batch_size=5, streaming=True)
+        self.assertEqual(len(events), events[-1]["total"])
+
+    def test_incremental_evaluation(self):
+        fn = get_fitted()
+        fn.fitness = "nodes"
+        fn.strategy = "bl"
+        fn.to_add, fn.to_remove = 1.0, 1.0
+        fn.candidates = get_plausible_edges(fn) + get_removable_edges(fn)
+        fn.candidates.append(fn.candidates[0])  # toggled twice
+        evaluator = MarginalizationEvaluator(fn)
+
+        genomes, fitnesses = [], []
+        for _ in range(10):
+            genome = list(np.random.choice(a=[0, 1], size=len(fn.candidates)))
+            eva_g = fn.g.copy()
+            for gene, e in zip(genome, fn.candidates):
+                if gene == 1:
+                    if eva_g.has_edge(*e[:2]):
+                        eva_g.remove_edge(*e[:2])
+                    else:
+                        eva_g.add_edge(*e[:2])
+            marg_dict = compute_marginalization_scores(eva_g, fn.attrs, fn.weights)
+            num_marg_nodes, marg, budget = (
+                len([v for v in marg_dict.values() if abs(v) > fn.thresh]),
+                np.mean([abs(v) for v in marg_dict.values()]),
+                sum(genome),
+            )
+
+            fitness = evaluator((genome,))
+            self.assertEqual(fitness[0], num_marg_nodes)
+            self.assertEqual(fitness[1], budget)
+            self.assertAlmostEqual(fitness[2], marg)
+            genomes.append(PackedGenome.from_genes(genome))
+            fitnesses.append(fitness)
+
+        for fitness, expected in zip(evaluator.evaluate_batch(genomes), fitnesses):
+            self.assertEqual(fitness[:2], expected[:2])
+            self.assertAlmostEqual(fitness[2], expected[2])
+
+        # both endpoints of an edge change, those of a self-loop once
+        fn.candidates = [(0, 1), (2, 2)]
+        evaluator = MarginalizationEvaluator(fn)
+        positions, nodes, _, d_degree = evaluator.endpoint_deltas(np.arange(2))
+        index = fn.index.node_index
+        self.assertEqual(positions.tolist(), [0, 1, 0])
+        self.assertEqual(nodes.tolist(), [index[0], index[2], index[1]])
+        self.assertEqual(d_degree.tolist(), [-1, 1, -1])
+
+    def test_seeding(self):
+        fn = get_fitted()
+        fn.fitness = "nodes"
+        fn.strategy = "bl"
+        fn.to_add, fn.to_remove = 1.0, 1.0
+        fn.candidates = get_plausible_edges(fn) + get_removable_edges(fn)
+        evaluator = MarginalizationEvaluator(fn)
+        base = evaluator((PackedGenome.from_genes([0] * len(fn.candidates)),))
+
+        d_nodes, d_marg = evaluator.single_flip_gains()
+        for i in range(0, len(fn.candidates), 7):
+            genes = [0] * len(fn.candidates)
+            genes[i] = 1
+            fitness = evaluator((genes,))
+            self.assertEqual(fitness[0] - base[0], d_nodes[i])
+            self.assertAlmostEqual(
+                (fitness[2] - base[2]) * len(fn.g), d_marg[i], places=6
+            )
+        for (u, v, *_), weight in zip(fn.candidates, evaluator.weights):
+            self.assertEqual(len(list(nx.common_neighbors(fn.g, u, v))), weight)
+
+        for genome in greedy_genomes(evaluator, 5):
+            fitness = evaluator((genome,))
+            self.assertGreater(genome.count(), 0)
+            self.assertLessEqual(fitness[0], base[0])
+        genomes = weighted_genomes(evaluator, 5)
+        self.assertEqual([len(genome) for genome in genomes], [len(fn.candidates)] * 5)
+
+        fn = get_fitted()
+        fn.run(
+            fitness="nodes",
+            strategy="bl",
+            to_add=1.0,
+            to_remove=1.0,
+            GA_params={
+                "NUM_GENERATIONS": 2,
+                "POPULATION_SIZE": 10,
+                "SEED_GREEDY": 0.2,
+                "SEED_WEIGHTED": 0.3,
+            },
+            display=False,
+        )
+        self.assertLessEqual(fn.logbook[0]["best"], base[0])
+
+    def test_solvers(self):
+        for fitness in ["nodes", "marg"]:
+            for solver in ["greedy", "local_search"]:
+                fn = get_fitted()
+                fn.run(
+                    fitness=fitness,
+                    strategy="bl",
+                    to_add=1.0,
+                    to_remove=1.0,
+                    solver=solver,
+                    display=False,
+                )
+                first, last = fn.logbook[0], fn.logbook[-1]
+                self.assertEqual(last["stop"], "converged")
+                self.assertLessEqual(last["best"], first["best"])
+                self.assertEqual(last["budget"], len(fn.solution))
+
+                # the fair graph matches the logbook
+                marg_dict = compute_marginalization_scores(
+                    fn.fair_g, fn.attrs, fn.weights
+                )
+                scores = [abs(v) for v in marg_dict.values()]
+                if fitness == "nodes":
+                    expected = len([v for v in scores if v > fn.thresh])
+                    self.assertEqual(last["best"], expected)
+                else:
+                    self.assertAlmostEqual(last["best"], np.mean(scores))
+
+        fn = get_fitted()
+        with self.assertRaises(ValueError):
+            fn.run(fitness="nodes", strategy="bl", to_remove=1.0, solver="anneal")
+
+    def test_packed_genome(self):
+        import copy
+
+        for size in [1, 7, 8, 13, 100]:
+            genome = PackedGenome.random(size)
+            genes = list(genome)
+            self.assertEqual(len(genes), size)
+            self.assertEqual(genome.count(), sum(genes))
+            self.assertEqual(genome, PackedGenome.from_genes(genes))
+            self.assertEqual(
+                list(genome.indices()), [i for i, j in enumerate(genes) if j == 1]
+            )
+
+            clone = copy.deepcopy(genome)
+            mut_flip_bit(clone, indpb=1.0)
+            self.assertEqual(list(clone), [1 - j for j in genes])
+            self.assertNotEqual(clone, genome)
+
+            other = PackedGenome.random(size)
+            genes1, genes2 = list(genome), list(other)
+            cx_two_point(genome, other)
+            # each position keeps its pair of genes, swapped over a single range
+            swapped = [
+                i
+                for i in range(size)
+                if (genome[i], other[i]) != (genes1[i], genes2[i])
+            ]
+            for i in range(size):
+                self.assertEqual({genome[i], other[i]}, {genes1[i], genes2[i]})
+            if swapped:
+                self.assertTrue(all(genes1[i] != genes2[i] for i in swapped))
+
     def test_algo(self):
         for fitness in ["marg", "nodes"]:
             for strategy in ["al", "ag", "rl", "rg", "ab", "rb"]:
@@ -67,6 +538,443 @@ class FairNetTest(TestCase):
         self.assertIsInstance(fair_g, nx.Graph)
         self.assertEqual(len(fair_g.nodes()), len(fn.g.nodes()))
         self.assertNotEqual(len(fair_g.edges()), len(fn.g.edges()))
+        self.assertIs(fn.fair_g, fair_g)  # built once
+        other = nx.Graph()
+        fn.fair_g = other  # assignable, as a plain attribute
+        self.assertIs(fn.get_fair_graph(), other)
+
+    def test_fair_view(self):
+        import tempfile
+
+        fn = get_fitted()
+        self.assertIsNone(fn.get_fair_view())
+        fn.run(
+            fitness="marg",
+            strategy="bl",
+            to_add=1.0,
+            to_remove=1.0,
+            solver="greedy",
+            display=False,
+        )
+        self.assertIsNone(fn._fair_g)  # not built yet
+        view = fn.get_fair_view()
+        fair_g = fn.get_fair_graph()
+        self.assertEqual(len(fn.delta), len(fn.solution))
+        self.assertEqual(view.number_of_edges(), fair_g.number_of_edges())
+        self.assertEqual(
+            {frozenset(e) for e in view.edges()}, {frozenset(e) for e in fair_g.edges()}
+        )
+        for node in fn.g.nodes():
+            self.assertEqual(set(view.neighbors(node)), set(fair_g.neighbors(node)))
+            self.assertEqual(view.degree(node), fair_g.degree(node))
+        for u, v, *_ in fn.solution:
+            self.assertEqual(view.has_edge(u, v), fair_g.has_edge(u, v))
+            self.assertNotEqual(view.has_edge(u, v), fn.g.has_edge(u, v))
+
+        # toggling an edge twice leaves it untouched
+        delta = EdgeDelta.from_toggled(fn.index, [(0, 1), (1, 0), (0, 9), (0, 9)])
+        self.assertEqual(len(delta), 0)
+
+        # without a graph object, the fair graph is built from the adjacency
+        with tempfile.TemporaryDirectory() as path:
+            fn.index.save(path)
+            disk = FairNet(GraphIndex.load(path)).fit(0.3)
+            disk.run(
+                fitness="marg",
+                strategy="bl",
+                to_add=1.0,
+                to_remove=1.0,
+                solver="greedy",
+                display=False,
+            )
+            disk_g = disk.get_fair_graph()
+            self.assertEqual(list(disk_g.nodes()), list(fair_g.nodes()))
+            self.assertEqual(
+                {frozenset(e) for e in disk_g.edges()},
+                {frozenset(e) for e in fair_g.edges()},
+            )
+            del disk
+
+    def test_profiling(self):
+        fn = get_fitted()
+        self.assertIsNone(fn.profile_report)
+        events = []
+        with fn.profile(hook=events.append) as profiler:
+            fn.run(
+                fitness="nodes",
+                strategy="bl",
+                to_add=1.0,
+                to_remove=1.0,
+                GA_params={"NUM_GENERATIONS": 3, "POPULATION_SIZE": 20},
+                display=False,
+            )
+            fn.get_fair_graph()
+        report = fn.profile_report
+        self.assertEqual(report, profiler.report())
+        phases = report["phases"]
+        for name in ["plausible_edges", "removable_edges", "solver", "fair_graph"]:
+            self.assertEqual(phases[name]["calls"], 1)
+        for name in ["selection", "variation"]:
+            self.assertEqual(phases[name]["calls"], len(fn.logbook) - 1)
+        self.assertEqual(phases["evaluation"]["calls"], len(fn.logbook))  # gen 0 too
+        self.assertGreaterEqual(phases["solver"]["peak_bytes"], 0)
+        self.assertGreaterEqual(
+            phases["solver"]["seconds"], phases["generation"]["seconds"]
+        )
+        self.assertEqual(
+            [g["generation"] for g in report["generations"]],
+            [r["gen"] for r in fn.logbook],
+        )
+        self.assertEqual(
+            report["counters"]["evaluations"], sum(r["misses"] for r in fn.logbook)
+        )
+        self.assertEqual(len(events), sum(p["calls"] for p in phases.values()))
+        self.assertEqual(events[-1]["phase"], "fair_graph")
+
+        # profiling is off outside the block
+        fn.fit(0.3)
+        self.assertNotIn("fit", fn.profile_report["phases"])
+
+        # Python 3.8 has no tracemalloc.reset_peak
+        import tracemalloc
+
+        reset_peak = tracemalloc.reset_peak
+        del tracemalloc.reset_peak
+        try:
+            with fn.profile():
+                fn.fit(0.3)
+                fn.run(
+                    fitness="nodes",
+                    strategy="bl",
+                    to_add=1.0,
+                    to_remove=1.0,
+                    GA_params={"NUM_GENERATIONS": 2, "POPULATION_SIZE": 20},
+                    display=False,
+                )
+        finally:
+            tracemalloc.reset_peak = reset_peak
+        phases = fn.profile_report["phases"]
+        self.assertGreater(phases["fit"]["peak_bytes"], 0)
+        self.assertGreaterEqual(
+            phases["solver"]["peak_bytes"], phases["generation"]["peak_bytes"]
+        )
+
+    def test_progress(self):
+        import io
+        from contextlib import redirect_stdout, redirect_stderr
+        from fairnet.progress import LoggingProgress, TqdmProgress
+
+        # silent by default
+        out = io.StringIO()
+        with redirect_stdout(out), redirect_stderr(out):
+            fn = get_fitted()
+            fn.run(
+                fitness="nodes",
+                strategy="bl",
+                to_add=1.0,
+                to_remove=1.0,
+                GA_params={"NUM_GENERATIONS": 3, "POPULATION_SIZE": 20},
+                display=False,
+            )
+        self.assertEqual(out.getvalue(), "")
+
+        events = []
+        fn = get_fitted()
+        fn.run(
+            fitness="nodes",
+            strategy="bl",
+            to_add=1.0,
+            to_remove=1.0,
+            GA_params={"NUM_GENERATIONS": 3, "POPULATION_SIZE": 20},
+            display=False,
+            progress=events.append,
+        )
+        kinds = [e["event"] for e in events]
+        self.assertEqual(kinds[-1], "end")
+        self.assertEqual(events[-1]["stop"], fn.logbook[-1]["stop"])
+        start = kinds.index("start")
+        self.assertEqual(set(kinds[:start]), {"candidates"})
+        self.assertEqual(
+            {e["stage"] for e in events[:start]}, {"plausible_edges", "removable_edges"}
+        )
+        self.assertEqual(events[start - 1]["done"], events[start - 1]["total"])
+        self.assertEqual(events[start]["candidates"], len(fn.candidates))
+        generations = [e for e in events if e["event"] == "generation"]
+        self.assertEqual(len(generations), len(fn.logbook))
+        for event, record in zip(generations, fn.logbook):
+            self.assertEqual(event["total"], 3)
+            self.assertEqual(event["gen"], record["gen"])
+            self.assertEqual(event["best"], record["best"])
+
+        # adapters
+        with self.assertLogs("fairnet", level="INFO") as logs:
+            get_fitted().run(
+                fitness="nodes",
+                strategy="bl",
+                to_add=1.0,
+                to_remove=1.0,
+                solver="greedy",
+                display=False,
+                progress=LoggingProgress(),
+            )
+        self.assertTrue(logs.output[-1].startswith("INFO:fairnet:end solver=greedy"))
+        bars = io.StringIO()
+        progress = TqdmProgress(file=bars)
+        for event in events:
+            progress(event)
+        self.assertEqual(progress.bars, dict())  # all closed
+        self.assertIn("generations", bars.getvalue())
+
+    def test_lazy_imports(self):
+        import subprocess
+        import sys
+
+        code = (
+            "import sys, fairnet; "
+            "print(','.join(m for m in ('matplotlib', 'seaborn', 'tqdm') if m in sys.modules))"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(out.stdout.strip(), "")
+
+    def test_batch(self):
+        from fairnet import fit_many, fit_partition
+        from fairnet.marginalization import network_marginalization_score
+
+        g = nx.karate_club_graph()
+        attrs = {n: g.nodes[n]["club"] for n in g.nodes()}
+        egos = [(nx.ego_graph(g, n), attrs) for n in range(10)]
+        expected = []
+        for key, (ego, ego_attrs) in enumerate(egos):
+            fn = FairNet(ego, {n: ego_attrs[n] for n in ego}).fit(0.3)
+            expected.append(
+                (
+                    key,
+                    ego.number_of_nodes(),
+                    len(fn.disc_nodes),
+                    network_marginalization_score(fn.marg_dict),
+                    None,
+                )
+            )
+
+        self.assertEqual(list(fit_many(egos, 0.3)), expected)
+        results = sorted(fit_many(egos, 0.3, n_jobs=2, chunksize=3))
+        for result, exp in zip(results, expected):
+            self.assertEqual(result[:3], exp[:3])
+            self.assertAlmostEqual(result.sms, exp[3])
+        self.assertEqual(
+            [r.key for r in fit_many(dict(enumerate(egos)), 0.3, ordered=True)],
+            list(range(10)),
+        )
+
+        # partition, as a dict or as sets of nodes
+        partition = {n: attrs[n] for n in g.nodes()}
+        blocks = [{n for n in g if attrs[n] == club} for club in ["Mr. Hi", "Officer"]]
+        by_dict = {r.key: r for r in fit_partition(g, attrs, partition, 0.3)}
+        by_sets = list(fit_partition(g, attrs, blocks, 0.3, n_jobs=2, ordered=True))
+        for key, result in zip(["Mr. Hi", "Officer"], by_sets):
+            self.assertEqual(by_dict[key][1:], result[1:])
+        self.assertEqual(sum(r.n_nodes for r in by_sets), g.number_of_nodes())
+        sub = g.subgraph(blocks[1])
+        fn = FairNet(sub, {n: attrs[n] for n in sub}).fit(0.3)
+        self.assertEqual(by_sets[1].marginalized, len(fn.disc_nodes))
+
+        # errors
+        with self.assertRaises(ZeroDivisionError):
+            list(fit_partition(g, attrs, [{0}], 0.3))
+        (result,) = fit_partition(g, attrs, [{0}], 0.3, errors="return")
+        self.assertIsNone(result.sms)
+        self.assertTrue(result.error.startswith("ZeroDivisionError"))
+        with self.assertRaises(ValueError):
+            fit_many(egos, 0.3, errors="ignore")
+
+    def test_parallel_evaluation(self):
+        GA_params = {"NUM_GENERATIONS": 2, "POPULATION_SIZE": 20, "N_JOBS": 2}
+        fn = get_fitted()
+        fn.run(
+            fitness="nodes",
+            strategy="bl",
+            to_add=1.0,
+            to_remove=1.0,
+            GA_params=GA_params,
+            display=False,
+        )
+        self.assertEqual(len(fn.logbook), 3)
+
+        g, attrs = get_data(all_attrs=False)
+        fn = FairNet(g, attrs)
+        fn.replace_missing_values(
+            thresh=0.3, fitness="marg", GA_params=GA_params, display=False
+        )
+        self.assertEqual(len(fn.logbook), 3)
+        self.assertEqual(len(fn.attrs), len(fn.g.nodes()))
+
+    def test_island_model(self):
+        GA_params = {
+            "NUM_GENERATIONS": 4,
+            "POPULATION_SIZE": 10,
+            "ISLANDS": 2,
+            "MIGRATION_INTERVAL": 2,
+        }
+        for topology in ["ring", "random"]:
+            fn = get_fitted()
+            fn.run(
+                fitness="nodes",
+                strategy="bl",
+                to_add=1.0,
+                to_remove=1.0,
+                GA_params={**GA_params, "TOPOLOGY": topology},
+                display=False,
+            )
+            self.assertEqual(len(fn.logbook), 5)
+            self.assertEqual(fn.logbook[-1]["stop"], "generations")
+            # the solution is the best individual over all islands and generations
+            genes = [int(e in fn.solution) for e in fn.candidates]
+            fitness = MarginalizationEvaluator(fn)((genes,))
+            best = min(record["best"] for record in fn.logbook)
+            self.assertLessEqual(fitness[0], best)
+
+        fn = get_fitted()
+        with self.assertRaises(ValueError):
+            fn.run(
+                fitness="nodes",
+                strategy="bl",
+                to_add=1.0,
+                to_remove=1.0,
+                GA_params={**GA_params, "CHECKPOINT": "unused.npz"},
+                display=False,
+            )
+
+    def test_fitness_cache(self):
+        cache = FitnessCache(2)
+        keys = [genome_key(PackedGenome.from_genes([i, 1, 0])) for i in [0, 1]]
+        keys.append(genome_key(["a", "b"]))
+        cache.put(keys[0], (1,))
+        cache.put(keys[1], (2,))
+        self.assertEqual(cache.get(keys[0]), (1,))
+        cache.put(keys[2], (3,))  # evicts the least recently used one
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[0]), (1,))
+
+        fn = get_fitted()
+        fn.run(
+            fitness="nodes",
+            strategy="al",
+            to_add=1.0,
+            GA_params={"NUM_GENERATIONS": 5, "CACHE_SIZE": 1000},
+            display=False,
+        )
+        hits, misses = fn.logbook.select("hits", "misses")
+        self.assertEqual(misses[0], 150)
+        self.assertGreater(sum(hits), 0)
+
+    def test_missing_values_evaluation(self):
+        for directed in [False, True]:
+            g, attrs = get_data(all_attrs=False)
+            if directed:
+                g = nx.gnp_random_graph(60, 0.1, seed=42, directed=True)
+                attrs = {n: n % 3 for n in g.nodes() if n % 7 != 0}
+            fn = FairNet(g, attrs)
+            fn.thresh, fn.fitness = 0.3, "nodes"
+            evaluator = MissingValuesEvaluator(fn)
+            self.assertEqual(evaluator.labels, fn.index.labels)
+
+            for _ in range(10):
+                genome = random_individual_missing(evaluator)
+                full = dict(attrs)
+                full.update(zip(fn.missing, [evaluator.labels[c] for c in genome]))
+                marg_dict = compute_marginalization_scores(
+                    g, full, compute_weights(full)
+                )
+                fitness = evaluator((genome,))
+                self.assertEqual(
+                    fitness[0], len([v for v in marg_dict.values() if abs(v) > 0.3])
+                )
+                self.assertAlmostEqual(
+                    fitness[1], np.mean([abs(v) for v in marg_dict.values()])
+                )
+            self.assertEqual(fn.attrs, attrs)  # left untouched
+
+            # mutations always pick another code
+            mutant = list(genome)
+            mutate_missing(mutant, indpb=1.0, n_labels=len(evaluator.labels))
+            self.assertTrue(all(m != c for m, c in zip(mutant, genome)))
+            self.assertTrue(all(0 <= m < len(evaluator.labels) for m in mutant))
+
+    def test_early_stopping(self):
+        for GA_params, reason in [
+            ({"NUM_GENERATIONS": 3}, "generations"),
+            ({"PATIENCE": 2, "MIN_DELTA": 100}, "stall"),
+            ({"TARGET_FITNESS": 100}, "target"),
+            ({"TIME_LIMIT": 0}, "time"),
+        ]:
+            fn = get_fitted()
+            fn.run(
+                fitness="nodes",
+                strategy="al",
+                to_add=1.0,
+                GA_params=GA_params,
+                display=False,
+            )
+            self.assertEqual(fn.logbook[-1]["stop"], reason)
+            if reason == "stall":
+                self.assertEqual(len(fn.logbook), 3)
+            elif reason != "generations":
+                self.assertEqual(len(fn.logbook), 1)
+
+    def test_checkpoint_resume(self):
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ga.npz")
+            runs = []
+            for n_gens, GA_params, resume_from in [
+                (6, {}, None),
+                (3, {"CHECKPOINT": path}, None),
+                (6, {}, path),
+            ]:
+                GA_params.update(NUM_GENERATIONS=n_gens, POPULATION_SIZE=20)
+                if resume_from is None:
+                    random.seed(42)
+                    np.random.seed(42)
+                fn = get_fitted()
+                fn.run(
+                    fitness="nodes",
+                    strategy="bl",
+                    to_add=1.0,
+                    to_remove=1.0,
+                    GA_params=GA_params,
+                    display=False,
+                    resume_from=resume_from,
+                )
+                runs.append(fn)
+            self.assertEqual(list(runs[2].logbook), list(runs[0].logbook))
+            self.assertEqual(runs[2].solution, runs[0].solution)
+
+            runs = []
+            g, attrs = get_data(all_attrs=False)
+            for n_gens, GA_params, resume_from in [
+                (4, {}, None),
+                (2, {"CHECKPOINT": path, "CHECKPOINT_EVERY": 2}, None),
+                (4, {}, path),
+            ]:
+                GA_params.update(NUM_GENERATIONS=n_gens, POPULATION_SIZE=20)
+                if resume_from is None:
+                    random.seed(42)
+                    np.random.seed(42)
+                fn = FairNet(g, attrs)
+                fn.replace_missing_values(
+                    thresh=0.3,
+                    fitness="nodes",
+                    GA_params=GA_params,
+                    display=False,
+                    resume_from=resume_from,
+                )
+                runs.append(fn)
+            self.assertEqual(list(runs[2].logbook), list(runs[0].logbook))
+            self.assertEqual(runs[2].attrs, runs[0].attrs)
 
     def test_replace_missing_values(self):
         g, attrs = get_data(all_attrs=False)
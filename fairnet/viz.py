@@ -1,5 +1,5 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+# matplotlib and seaborn are imported by the plotting functions only, so that importing fairnet does not load
+# them (nor need a display backend)
 
 __all__ = [
     "plot_GA_eval",
@@ -15,6 +15,9 @@ def plot_GA_eval(logbook, fitness):
     :param logbook: _description_
     :param fitness: _description_
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     sns.set_style("whitegrid")
     minFitnessValues, meanFitnessValues = logbook.select("best", "avg")
 
@@ -37,6 +40,9 @@ def plot_marginalization_scores(marg_dict):
 
     :param marg_dict: _description_
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     sns.set_style("whitegrid")
     fig, ax = plt.subplots()
     sns.kdeplot(list(marg_dict.values()), ax=ax)
@@ -52,6 +58,9 @@ def plot_marginalization_scores_by_attr(attrs, marg_dict):
     :param attrs: _description_
     :param marg_dict: _description_
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     _, ax = plt.subplots()
     for label in set(list(attrs.values())):
         labeled_nodes = [k for k, v in attrs.items() if v == label]